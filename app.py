@@ -1,20 +1,156 @@
 # app.py
-from flask import Flask, render_template, redirect, url_for, request, flash
-import json
+from flask import Flask, render_template, redirect, url_for, request, flash, jsonify, g, Response
+from flask import before_render_template, template_rendered
 import os
-import sys
-import subprocess
 import shutil
 import getpass
+import time
+import sqlite3
+import threading
 from datetime import datetime
-from sysinfo_script import gather_system_info
-from browser_scan import parse_brave_history   # <-- Import your function
-
-python_executable = sys.executable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from sysinfo_script import SystemInfoCache
+from browser_scan import build_scan_result, brave_history_path, export_history_json, history_page, PAGE_SIZE
+from scan_state import scan_incremental
+from forensics_script import analyze_image
+from job_queue import JobQueue
+from snapshot_store import record_snapshot
+import metrics
+from metrics import span
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key'  # For flash messages
 
+# Warm worker processes for forensic analysis, created on first use
+ANALYSIS_WORKERS = int(os.environ.get("FORENSICS_WORKERS", "2"))
+# Hives parsed in parallel within one analysis (1 = serial)
+ANALYSIS_JOBS = int(os.environ.get("FORENSICS_JOBS", "1"))
+analysis_pool = None
+# Request threads and job workers all reach for the pool; only one may create it
+analysis_pool_lock = threading.Lock()
+
+
+def warm_analysis_worker():
+    # Importing forensics_script loads python-registry once per worker process
+    import forensics_script  # noqa: F401
+
+
+def get_analysis_pool():
+    global analysis_pool
+    with analysis_pool_lock:
+        if analysis_pool is None:
+            analysis_pool = ProcessPoolExecutor(max_workers=ANALYSIS_WORKERS, initializer=warm_analysis_worker)
+            # Start every worker now so no request pays interpreter startup
+            for _ in range(ANALYSIS_WORKERS):
+                analysis_pool.submit(warm_analysis_worker)
+        return analysis_pool
+
+
+def reset_analysis_pool(broken_pool):
+    # A worker that died (OOM, segfault in a parser) breaks the whole pool; drop it so the
+    # next call starts a fresh one, unless another thread already has
+    global analysis_pool
+    with analysis_pool_lock:
+        if analysis_pool is broken_pool:
+            analysis_pool = None
+    broken_pool.shutdown(wait=False)
+
+
+def run_analysis(image_path):
+    # Retry once on a fresh pool; a second break fails the job
+    for attempt in range(2):
+        pool = get_analysis_pool()
+        try:
+            return pool.submit(metrics.collect_spans, analyze_image, image_path, ANALYSIS_JOBS).result()
+        except BrokenProcessPool:
+            reset_analysis_pool(pool)
+            if attempt:
+                raise
+
+
+# Background jobs, so long analyses never hold a request thread
+JOB_CONCURRENCY = int(os.environ.get("JOB_CONCURRENCY", str(ANALYSIS_WORKERS)))
+job_queue = None
+job_queue_lock = threading.Lock()
+
+
+def run_job(kind, payload):
+    if kind == "forensic-image-analysis":
+        # Spans from the worker process are replayed here so /metrics sees the per-hive times
+        result, spans = run_analysis(payload["image_path"])
+        metrics.replay(spans)
+        with span("snapshot"):
+            record_snapshot("forensics", result, host=os.path.abspath(payload["image_path"]))
+        return result
+    raise ValueError(f"Unknown job kind: {kind}")
+
+
+def get_job_queue():
+    global job_queue
+    with job_queue_lock:
+        if job_queue is None:
+            job_queue = JobQueue(run_job, max_concurrency=JOB_CONCURRENCY)
+            job_queue.start()
+        return job_queue
+
+
+# Optional compact JSON export of the full scanned history, refreshed off the request path
+BROWSER_SCAN_EXPORT = os.environ.get("BROWSER_SCAN_EXPORT", "")
+history_export_lock = threading.Lock()
+
+
+def export_history():
+    try:
+        with span("history_export"):
+            export_history_json(BROWSER_SCAN_EXPORT)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Could not export browser history: {e}")
+    finally:
+        history_export_lock.release()
+
+
+def schedule_history_export():
+    # One export at a time; scans arriving while it runs don't queue another
+    if BROWSER_SCAN_EXPORT and history_export_lock.acquire(blocking=False):
+        threading.Thread(target=export_history, daemon=True).start()
+
+
+# Live system info, kept in memory with a TTL per field class
+system_info_cache = SystemInfoCache()
+
+
+# Per-request stage timings, reported in a Server-Timing header and as /metrics histograms
+def start_request_timing():
+    g.request_start = time.perf_counter()
+    metrics.start_collection()
+
+
+def finish_request_timing(response):
+    total = time.perf_counter() - g.pop("request_start", time.perf_counter())
+    spans = metrics.finish_collection()
+    response.headers["Server-Timing"] = metrics.server_timing(spans, total)
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.ROUTE_SECONDS.observe(total, route=route, method=request.method, status=response.status_code)
+    return response
+
+
+def start_render_timing(sender, template, context, **extra):
+    g.render_start = time.perf_counter()
+
+
+def finish_render_timing(sender, template, context, **extra):
+    start = g.pop("render_start", None)
+    if start is not None:
+        metrics.record("render", time.perf_counter() - start)
+
+
+if metrics.ENABLED:
+    app.before_request(start_request_timing)
+    app.after_request(finish_request_timing)
+    before_render_template.connect(start_render_timing, app)
+    template_rendered.connect(finish_render_timing, app)
+
 
 @app.route("/")
 def main():
@@ -23,9 +159,11 @@ def main():
 
 @app.route("/live-system-analysis")
 def live_system_analysis():
-    gather_system_info()
-    with open("SysInfo.json", "r") as json_file:
-        system_info = json.load(json_file)
+    # ?refresh=1 collects every field again instead of serving cached values
+    with span("sysinfo"):
+        system_info = system_info_cache.get(force=bool(request.args.get("refresh")))
+    with span("snapshot"):
+        record_snapshot("sysinfo", system_info)
     return render_template("system_info.html", system_info=system_info)
 
 
@@ -38,48 +176,91 @@ def forensic_image_analysis():
             flash("Invalid file path")
             return redirect(url_for('forensic_image_analysis'))
 
-        try:
-            result = subprocess.run(
-                [python_executable, 'forensics_script.py', image_path],
-                capture_output=True, text=True
-            )
-
-            print("Subprocess stdout:", result.stdout)
-            print("Subprocess stderr:", result.stderr)
-            print("Subprocess returncode:", result.returncode)
-
-            if os.path.exists('forensics1.json'):
-                with open("forensics1.json", "r") as json_file:
-                    forensic_data = json.load(json_file)
-
-                return render_template("forensics_info.html", system_info=forensic_data)
-            else:
-                flash("Error: Forensic data not generated.")
-                return redirect(url_for('forensic_image_analysis'))
-
-        except Exception as e:
-            flash(f"An error occurred during analysis: {e}")
-            return redirect(url_for('forensic_image_analysis'))
+        # Queue the analysis and return straight away; each job keeps its own result
+        job_id = get_job_queue().submit("forensic-image-analysis", {"image_path": image_path})
+        return redirect(url_for('forensic_job', job_id=job_id))
 
     return render_template("forensics.html")
 
 
+@app.route("/forensic-image-analysis/<job_id>")
+def forensic_job(job_id):
+    job = get_job_queue().get(job_id, include_result=True)
+    if job is None:
+        flash("Unknown analysis job")
+        return redirect(url_for('forensic_image_analysis'))
+
+    if job["status"] == "failed":
+        flash(f"An error occurred during analysis: {job.get('error')}")
+        return redirect(url_for('forensic_image_analysis'))
+
+    if job["status"] == "done":
+        if job.get("result"):
+            return render_template("forensics_info.html", system_info=job["result"])
+        flash("Error: Forensic data not generated.")
+        return redirect(url_for('forensic_image_analysis'))
+
+    return render_template("job_status.html", job=job)
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
 # NEW ROUTE for Browser Scanning
 @app.route("/browser-scanning")
 def browser_scanning():
     try:
-        scan_result = parse_brave_history(limit=100)
+        next_page = None
+        # ?incremental=1 only checks visits since the previous incremental scan
+        if request.args.get("incremental"):
+            scan_result = scan_incremental()
+        elif not os.path.exists(brave_history_path()):
+            scan_result = {"error": "Brave history not found"}
+        else:
+            # Only the newest page is rendered; the page fetches the rest from /api/browser-history
+            entries, next_page = history_page(limit=PAGE_SIZE)
+            scan_result = build_scan_result(entries)
+            schedule_history_export()
 
-        # Save results to JSON
-        with open("browser_scan.json", "w") as json_file:
-            json.dump(scan_result, json_file, indent=4)
+        with span("snapshot"):
+            record_snapshot("browser", scan_result)
 
-        return render_template("browser_scan.html", scan_data=scan_result)
+        return render_template("browser_scan.html", scan_data=scan_result, next_page=next_page)
 
     except Exception as e:
         flash(f"Browser scan failed: {e}")
         return redirect(url_for("main"))
 
 
+@app.route("/api/browser-history")
+def browser_history_api():
+    # Keyset pagination: pass the "next" cursor of one page to get the following one
+    page_args = {}
+    try:
+        for name in ("after", "after_id", "limit"):
+            if request.args.get(name):
+                page_args[name] = int(request.args[name])
+    except ValueError:
+        return jsonify({"error": "after, after_id and limit must be integers"}), 400
+
+    if not os.path.exists(brave_history_path()):
+        return jsonify({"error": "Brave history not found"}), 404
+
+    entries, next_page = history_page(**page_args)
+    return jsonify({"browser": "Brave", "history": entries, "next": next_page})
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
+    get_analysis_pool()
+    get_job_queue()
     app.run(debug=False)
@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from forensics_script import analyze_image
+from hive_cache import HASH_MODES
+
+# Yield image roots from a directory of exported hive folders or from a manifest file
+def iter_images(source):
+    if os.path.isdir(source):
+        with os.scandir(source) as it:
+            for entry in sorted(it, key=lambda e: e.name):
+                if entry.is_dir():
+                    yield entry.path
+    else:
+        # One image path per line; blank lines and # comments are skipped
+        with open(source, "r") as manifest:
+            for line in manifest:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    yield line
+
+def init_worker():
+    # analyze_image reports missing hives on stdout, which would corrupt the NDJSON stream
+    sys.stdout = sys.stderr
+
+def analyze_one(image_path, use_cache, hash_mode):
+    start = time.perf_counter()
+    record = {"image": image_path}
+    try:
+        if not os.path.exists(image_path):
+            raise FileNotFoundError(f"Image path not found: {image_path}")
+        forensic_data = analyze_image(image_path, use_cache=use_cache, hash_mode=hash_mode)
+        if forensic_data:
+            record["status"] = "ok"
+            record["data"] = forensic_data
+        else:
+            record["status"] = "failed"
+            record["error"] = "Forensic data not generated."
+    except Exception as e:
+        record["status"] = "failed"
+        record["error"] = str(e)
+    record["seconds"] = round(time.perf_counter() - start, 4)
+    return record
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def run_batch(images, out, workers, use_cache=True, hash_mode="sampled"):
+    start = time.perf_counter()
+    timings = []
+    failures = 0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        # Keep a bounded number of images in flight so memory stays flat for any batch size
+        in_flight = set()
+        images = iter(images)
+        exhausted = False
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < workers * 2:
+                image_path = next(images, None)
+                if image_path is None:
+                    exhausted = True
+                    break
+                in_flight.add(pool.submit(analyze_one, image_path, use_cache, hash_mode))
+            if not in_flight:
+                break
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                record = future.result()
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                timings.append(record["seconds"])
+                if record["status"] != "ok":
+                    failures += 1
+
+    elapsed = time.perf_counter() - start
+    timings.sort()
+    return {
+        "images": len(timings),
+        "failures": failures,
+        "elapsed_seconds": round(elapsed, 3),
+        "images_per_second": round(len(timings) / elapsed, 2) if elapsed else 0.0,
+        "p50_seconds": percentile(timings, 0.50),
+        "p95_seconds": percentile(timings, 0.95),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze many exported hive folders and stream NDJSON results.")
+    parser.add_argument("source", help="Directory whose subfolders are image roots, or a manifest file with one path per line")
+    parser.add_argument("-o", "--output", help="Write NDJSON here instead of stdout")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Images analyzed in parallel")
+    parser.add_argument("--no-cache", action="store_true", help="Always parse hives, ignoring cached results")
+    parser.add_argument("--hash", choices=HASH_MODES, default="sampled",
+                        help="Fingerprint hives with a sampled or full SHA-256 for the result cache")
+    args = parser.parse_args()
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        summary = run_batch(iter_images(args.source), out, max(1, args.workers),
+                            use_cache=not args.no_cache, hash_mode=args.hash)
+    finally:
+        if args.output:
+            out.close()
+
+    print(f"{summary['images']} images in {summary['elapsed_seconds']}s "
+          f"({summary['images_per_second']} images/sec), "
+          f"p50 {summary['p50_seconds']}s, p95 {summary['p95_seconds']}s, "
+          f"{summary['failures']} failed", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Measure the cost of the old copy-then-open History access against the read-only URI open.
+
+    python -m benchmarks.bench_history_open path/to/History
+"""
+
+import os
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import time
+
+from browser_scan import open_history
+
+
+def copy_then_open(history_path):
+    # The previous behaviour: copy the whole database before every scan
+    temp_path = os.path.join(tempfile.gettempdir(), "bench_copied_history.db")
+    start = time.perf_counter()
+    shutil.copy2(history_path, temp_path)
+    conn = sqlite3.connect(temp_path)
+    opened = time.perf_counter()
+    conn.execute("SELECT url, title, last_visit_time FROM urls ORDER BY last_visit_time DESC LIMIT 100").fetchall()
+    done = time.perf_counter()
+    conn.close()
+    os.remove(temp_path)
+    return opened - start, done - start
+
+
+def read_only_open(history_path, immutable):
+    start = time.perf_counter()
+    with open_history(history_path, immutable) as conn:
+        opened = time.perf_counter()
+        conn.execute("SELECT url, title, last_visit_time FROM urls ORDER BY last_visit_time DESC LIMIT 100").fetchall()
+        done = time.perf_counter()
+    return opened - start, done - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("history_path")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    size_mb = os.path.getsize(args.history_path) / (1024 * 1024)
+    print(f"History database: {size_mb:.1f} MB, best of {args.repeat}")
+    print(f"{'method':<16} {'open ms':>10} {'open+query ms':>14}")
+
+    methods = {
+        "copy + open": lambda: copy_then_open(args.history_path),
+        "mode=ro": lambda: read_only_open(args.history_path, False),
+        "immutable=1": lambda: read_only_open(args.history_path, True),
+    }
+    for name, method in methods.items():
+        runs = [method() for _ in range(args.repeat)]
+        open_ms = min(run[0] for run in runs) * 1000
+        total_ms = min(run[1] for run in runs) * 1000
+        print(f"{name:<16} {open_ms:>10.2f} {total_ms:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
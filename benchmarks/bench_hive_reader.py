@@ -0,0 +1,78 @@
+"""
+Compare the mmap hive backend with python-registry's full read.
+
+Each backend runs in a fresh interpreter so peak RSS is measured in isolation:
+
+    python -m benchmarks.bench_hive_reader path/to/SOFTWARE --key "Microsoft\\Windows NT\\CurrentVersion"
+"""
+
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+
+from hive_reader import HIVE_BACKENDS, open_hive
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_child(hive_path, backend, key_paths):
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    hive = open_hive(hive_path, backend)
+    opened = time.perf_counter()
+    for key_path in key_paths:
+        key = hive.open(key_path) if key_path else hive.root()
+        [value.value() for value in key.values()]
+    done = time.perf_counter()
+    print(json.dumps({
+        "backend": backend,
+        "open_ms": round((opened - start) * 1000, 2),
+        "lookup_ms": round((done - opened) * 1000, 2),
+        "total_ms": round((done - start) * 1000, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "rss_growth_mb": round(peak_rss_mb() - baseline, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("hive_path")
+    parser.add_argument("--key", action="append", default=[], help="Key path to open (repeatable)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", choices=HIVE_BACKENDS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    key_paths = args.key or [""]
+
+    if args.child:
+        run_child(args.hive_path, args.child, key_paths)
+        return
+
+    results = {}
+    for backend in HIVE_BACKENDS:
+        runs = []
+        for _ in range(args.repeat):
+            cmd = [sys.executable, "-m", "benchmarks.bench_hive_reader", args.hive_path, "--child", backend]
+            for key_path in key_paths:
+                cmd += ["--key", key_path]
+            output = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(output))
+        # Report the fastest run and the largest resident set seen
+        best = min(runs, key=lambda run: run["total_ms"])
+        best["peak_rss_mb"] = max(run["peak_rss_mb"] for run in runs)
+        best["rss_growth_mb"] = max(run["rss_growth_mb"] for run in runs)
+        results[backend] = best
+
+    print(f"{'backend':<8} {'open ms':>10} {'lookup ms':>10} {'total ms':>10} {'peak RSS MB':>12} {'RSS growth MB':>14}")
+    for backend, run in results.items():
+        print(f"{backend:<8} {run['open_ms']:>10} {run['lookup_ms']:>10} {run['total_ms']:>10} "
+              f"{run['peak_rss_mb']:>12} {run['rss_growth_mb']:>14}")
+
+
+if __name__ == "__main__":
+    main()
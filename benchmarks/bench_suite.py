@@ -0,0 +1,317 @@
+"""
+Time every pipeline stage on synthetic fixtures and compare against a saved baseline.
+
+Fixtures (a registry image and History databases of several sizes) are
+generated in a temporary directory, which is also the working directory while
+the cases run, so index, cache and snapshot files never land in the repo.
+
+    python -m benchmarks.bench_suite --save-baseline benchmarks/baseline.json
+    python -m benchmarks.bench_suite --compare benchmarks/baseline.json
+
+A case regresses when its median is more than its threshold (a ratio, 1.25 by
+default, editable per case in the baseline file) slower than the baseline.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+
+from benchmarks import synthetic
+
+DEFAULT_THRESHOLD = 1.25
+
+# Differences below this are timer noise, whatever the ratio
+NOISE_FLOOR_MS = 0.5
+
+HISTORY_SIZES = (1000, 10000, 100000)
+QUICK_HISTORY_SIZES = (1000, 10000)
+
+MALICIOUS_CHECK_URLS = 100000
+
+
+def measure(fn, repeat, setup=None, items=None):
+    """Run fn once to warm up, then repeat times; setup runs untimed before each call."""
+    if setup:
+        setup()
+    fn()
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - start) * 1000)
+
+    result = {"median_ms": round(statistics.median(runs), 3), "min_ms": round(min(runs), 3), "runs": repeat}
+    if items:
+        result["items_per_sec"] = round(items / (statistics.median(runs) / 1000))
+    return result
+
+
+def bench_hives(work_dir, keys, depth, repeat):
+    from forensics_script import HIVE_INDEX_DIR, HIVE_EXTRACTORS, find_hive_files, analyze_image
+    from hive_visitors import extract_hive
+
+    image_path = os.path.join(work_dir, "image")
+    hive_paths = synthetic.generate_image(image_path, keys, depth)
+    cases = {}
+
+    def drop_index():
+        shutil.rmtree(HIVE_INDEX_DIR, ignore_errors=True)
+
+    cases["find_hive_files.cold"] = measure(lambda: find_hive_files(image_path, "SOFTWARE"), repeat, setup=drop_index)
+    cases["find_hive_files.warm"] = measure(lambda: find_hive_files(image_path, "SOFTWARE"), repeat)
+
+    for hive_name, extractor in HIVE_EXTRACTORS:
+        cases[extractor.__name__] = measure(lambda: extractor(hive_paths[hive_name]), repeat)
+
+    cases["analyze_image.uncached"] = measure(lambda: analyze_image(image_path, use_cache=False), repeat)
+
+    # Twenty visitors on the same filler subtree, in one shared pass and in one pass each
+    visitors = [filler_visitor(i) for i in range(20)]
+    cases["extract_hive.visitors.1"] = measure(lambda: extract_hive("SYSTEM", hive_paths["SYSTEM"], visitors[:1]), repeat)
+    cases["extract_hive.visitors.20"] = measure(lambda: extract_hive("SYSTEM", hive_paths["SYSTEM"], visitors), repeat)
+    cases["extract_hive.visitors.20.separate"] = measure(
+        lambda: [extract_hive("SYSTEM", hive_paths["SYSTEM"], [visitor]) for visitor in visitors], repeat)
+    return cases
+
+
+def filler_visitor(i):
+    from hive_visitors import KeyVisitor
+
+    class FillerVisitor(KeyVisitor):
+        hive = "SYSTEM"
+        patterns = {"Key*\\*\\*": "visit_key"}
+
+        def __init__(self, control_set):
+            super().__init__(control_set)
+            self.keys = 0
+
+        def visit_key(self, path, key):
+            self.keys += 1
+
+        def result(self):
+            return {f"filler {i}": self.keys}
+
+    return FillerVisitor
+
+
+def bench_history(history_sizes, repeat):
+    from browser_scan import brave_history_path, parse_brave_history, history_page, export_history_json
+    from history_table import load_history_table
+
+    cases = {}
+    history_path = brave_history_path()
+    os.makedirs(os.path.dirname(history_path), exist_ok=True)
+    for url_count in history_sizes:
+        synthetic.generate_history(history_path, url_count, expired_every=25)
+        cases[f"parse_brave_history.all.{url_count}"] = measure(lambda: parse_brave_history(limit=None), repeat,
+                                                                items=url_count)
+    cases[f"parse_brave_history.limit100.{history_sizes[-1]}"] = measure(lambda: parse_brave_history(limit=100),
+                                                                         repeat)
+    cases[f"history_page.100.{history_sizes[-1]}"] = measure(lambda: history_page(limit=100), repeat)
+    check_history_pages(history_page, export_history_json)
+    cases[f"load_history_table.{history_sizes[-1]}"] = measure(load_history_table, repeat, items=history_sizes[-1])
+    table = load_history_table()
+    cases[f"history_table.top_domains.{history_sizes[-1]}"] = measure(lambda: table.top_domains(10), repeat)
+    cases[f"history_table.visits_per_hour.{history_sizes[-1]}"] = measure(table.visits_per_hour, repeat)
+    return cases
+
+
+def check_history_pages(history_page, export_history_json):
+    """Paging through the whole history must list the same rows as the full export."""
+    export_path = "history_export.json"
+    export_history_json(export_path)
+    with open(export_path, "r", encoding="utf-8") as f:
+        exported = json.load(f)["history"]
+
+    paged = []
+    cursor = {}
+    while cursor is not None:
+        entries, cursor = history_page(limit=1000, **cursor)
+        paged.extend({key: entry[key] for key in ("url", "title", "last_visit")} for entry in entries)
+
+    def key(entry):
+        return entry["last_visit"] or "", entry["url"]
+
+    if sorted(paged, key=key) != sorted(exported, key=key):
+        raise RuntimeError(f"history_page listed {len(paged)} rows, export_history_json {len(exported)}")
+
+
+def bench_is_malicious(repeat):
+    from browser_scan import is_malicious
+
+    domains = synthetic.SAMPLE_DOMAINS + synthetic.SAMPLE_MALICIOUS
+    urls = [f"{'http' if i % 7 == 0 else 'https'}://{domains[i % len(domains)]}/page/{i}?q={i}"
+            for i in range(MALICIOUS_CHECK_URLS)]
+
+    def check_all():
+        for url in urls:
+            is_malicious(url)
+
+    return {"is_malicious": measure(check_all, repeat, items=len(urls))}
+
+
+def bench_carving(work_dir, keys, repeat):
+    from hive_reader import open_hive, walk_keys
+    from hive_carver import carve_hive, CARVE_WORKERS
+
+    # Lay the live tree out once to learn its cell offsets, then add deleted keys under known parents;
+    # the deleted cells go after the live ones, so those offsets stay valid
+    hive_path = os.path.join(work_dir, "CARVE")
+    tree = synthetic.filler_tree(keys, 4)
+    synthetic.write_hive(hive_path, tree, root_name="SOFTWARE")
+    offsets = {path: nk.offset() - 0x1000 - 4 for path, nk in walk_keys(open_hive(hive_path)) if path}
+    parents = sorted(offsets)[:100]
+    deleted_keys = [(f"Deleted{i:05d}", offsets[parents[i % len(parents)]], synthetic.BASE_FILETIME + i)
+                    for i in range(max(1, keys // 10))]
+    deleted_values = [(f"Removed{i:05d}", f"deleted value {i}") for i in range(max(1, keys // 20))]
+    synthetic.write_hive(hive_path, tree, root_name="SOFTWARE", deleted_keys=deleted_keys,
+                         deleted_values=deleted_values)
+
+    expected = {f"{parents[i % len(parents)]}\\{name}" for i, (name, _, _) in enumerate(deleted_keys)}
+    size = os.path.getsize(hive_path)
+    cases = {}
+    for workers in sorted({1, CARVE_WORKERS}):
+        def carve(workers=workers):
+            records = list(carve_hive(hive_path, workers))
+            found = {record["path"] for record in records if record["type"] == "key"}
+            values = sum(1 for record in records if record["type"] == "value")
+            if found != expected or values != len(deleted_values):
+                raise RuntimeError(f"carve_hive recovered {len(found)} of {len(expected)} keys, "
+                                   f"{values} of {len(deleted_values)} values")
+
+        result = measure(carve, repeat, items=size)
+        result["mb_per_sec"] = round(size / 1e6 / (result["median_ms"] / 1000), 1)
+        cases[f"carve_hive.workers{workers}"] = result
+    return cases
+
+
+def bench_routes(repeat):
+    import app
+
+    client = app.app.test_client()
+    routes = {
+        "/": 200,
+        "/live-system-analysis": 200,
+        "/browser-scanning": 200,
+        "/forensic-image-analysis": 200,
+        "/jobs/missing": 404,
+    }
+    cases = {}
+    for route, expected in routes.items():
+        def get(route=route, expected=expected):
+            response = client.get(route)
+            if response.status_code != expected:
+                raise RuntimeError(f"{route} returned {response.status_code}, expected {expected}")
+
+        cases[f"route {route}"] = measure(get, repeat)
+    return cases
+
+
+def run_suite(work_dir, repeat=5, quick=False):
+    # The Flask routes and parse_brave_history read Brave's history from the home folder
+    os.environ["HOME"] = work_dir
+    # Keep the live system info route on in-process collectors
+    os.environ.setdefault("SYSINFO_BACKEND", "native")
+
+    history_sizes = QUICK_HISTORY_SIZES if quick else HISTORY_SIZES
+    cases = {}
+    cases.update(bench_hives(work_dir, keys=500 if quick else 5000, depth=4, repeat=repeat))
+    cases.update(bench_carving(work_dir, keys=5000 if quick else 50000, repeat=repeat))
+    cases.update(bench_history(history_sizes, repeat))
+    cases.update(bench_is_malicious(max(1, repeat // 2)))
+    cases.update(bench_routes(repeat))
+    return cases
+
+
+def compare(cases, baseline):
+    """Return (rows, regressions) comparing current medians with the baseline's."""
+    rows = []
+    regressions = []
+    for name, result in cases.items():
+        base = baseline.get("cases", {}).get(name)
+        if not base:
+            rows.append((name, result["median_ms"], None, None, "new"))
+            continue
+        threshold = base.get("threshold", DEFAULT_THRESHOLD)
+        ratio = result["median_ms"] / base["median_ms"] if base["median_ms"] else 1.0
+        regressed = ratio > threshold and result["median_ms"] - base["median_ms"] > NOISE_FLOOR_MS
+        status = "REGRESSED" if regressed else "ok"
+        rows.append((name, result["median_ms"], base["median_ms"], ratio, status))
+        if regressed:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="Smaller fixtures for a fast smoke run")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write the results as a new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Regression ratio stored with each case of a new baseline")
+    parser.add_argument("--compare", metavar="PATH", help="Compare with a baseline; exit 1 on regressions")
+    parser.add_argument("--keep", action="store_true", help="Keep the fixture directory")
+    args = parser.parse_args()
+
+    save_path = os.path.abspath(args.save_baseline) if args.save_baseline else None
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+
+    original_cwd = os.getcwd()
+    original_home = os.environ.get("HOME")
+    work_dir = tempfile.mkdtemp(prefix="bench-suite-")
+    os.chdir(work_dir)
+    try:
+        cases = run_suite(work_dir, args.repeat, args.quick)
+    finally:
+        os.chdir(original_cwd)
+        if original_home is not None:
+            os.environ["HOME"] = original_home
+        if args.keep:
+            print(f"Fixtures kept in {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if baseline:
+        rows, regressions = compare(cases, baseline)
+        print(f"{'case':<40} {'median ms':>10} {'baseline':>10} {'ratio':>7}  status")
+        for name, median, base, ratio, status in rows:
+            base_text = f"{base:>10.3f}" if base is not None else f"{'-':>10}"
+            ratio_text = f"{ratio:>7.2f}" if ratio is not None else f"{'-':>7}"
+            print(f"{name:<40} {median:>10.3f} {base_text} {ratio_text}  {status}")
+    else:
+        regressions = []
+        print(f"{'case':<40} {'median ms':>10} {'min ms':>10} {'items/s':>10} {'MB/s':>8}")
+        for name, result in cases.items():
+            print(f"{name:<40} {result['median_ms']:>10.3f} {result['min_ms']:>10.3f} "
+                  f"{result.get('items_per_sec', ''):>10} {result.get('mb_per_sec', ''):>8}")
+
+    if save_path:
+        document = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": args.quick,
+            "cases": {name: {**result, "threshold": args.threshold} for name, result in cases.items()},
+        }
+        with open(save_path, "w") as f:
+            json.dump(document, f, indent=4)
+        print(f"Baseline written to {save_path}")
+
+    if regressions:
+        print(f"{len(regressions)} case(s) regressed: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
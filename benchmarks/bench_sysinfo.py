@@ -0,0 +1,59 @@
+"""
+Compare the native system info collector with one shell spawn per field.
+
+Where PowerShell is installed (Windows, or pwsh on Linux) the real commands
+are timed. Otherwise each field is charged one interpreter spawn, a lower
+bound for what the subprocess path costs per field.
+
+    python -m benchmarks.bench_sysinfo
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+import sysinfo_script
+
+
+def time_native():
+    start = time.perf_counter()
+    sysinfo_script.gather_system_info(backend="native")
+    return time.perf_counter() - start
+
+
+def time_subprocess():
+    if shutil.which("powershell"):
+        start = time.perf_counter()
+        sysinfo_script.gather_system_info(backend="powershell")
+        return time.perf_counter() - start, "powershell"
+
+    # No PowerShell here: spawn a bare interpreter once per command the old path ran
+    start = time.perf_counter()
+    for _ in sysinfo_script.COMMANDS:
+        subprocess.run([sys.executable, "-c", "pass"], capture_output=True, check=True)
+    return time.perf_counter() - start, f"{len(sysinfo_script.COMMANDS)} x python -c pass"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # gather_system_info writes SysInfo.json into the working directory
+    os.chdir(tempfile.mkdtemp())
+
+    native = min(time_native() for _ in range(args.repeat))
+    runs = [time_subprocess() for _ in range(args.repeat)]
+    shell, label = min(run[0] for run in runs), runs[0][1]
+
+    print(f"native collector:   {native * 1000:9.2f} ms")
+    print(f"subprocess path:    {shell * 1000:9.2f} ms ({label})")
+    print(f"speedup:            {shell / native:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""
+Synthetic fixtures for benchmarks: registry hives and Chromium History databases.
+
+Everything is generated locally, so the benchmarks run offline on Linux.
+"""
+
+import os
+import struct
+
+HBIN_SIZE = 0x4000
+NO_OFFSET = 0xFFFFFFFF
+
+REG_SZ = 1
+REG_BINARY = 3
+REG_DWORD = 4
+
+# FILETIME for 2024-01-01 00:00:00 UTC
+BASE_FILETIME = 133485408000000000
+
+
+class HiveWriter:
+    """Lays out NK/VK/list cells in HBINs the way python-registry expects to find them."""
+
+    def __init__(self, hbin_size=HBIN_SIZE):
+        self.hbin_size = hbin_size
+        self.data = bytearray()
+        self.hbin_start = 0
+        self.hbin_end = 0
+        self.cursor = 0
+
+    def _new_hbin(self, min_size):
+        # Close the current HBIN with a free cell covering the unused tail
+        if self.cursor < self.hbin_end:
+            struct.pack_into("<i", self.data, self.cursor, self.hbin_end - self.cursor)
+
+        size = self.hbin_size
+        while size - 0x20 < min_size:
+            size += 0x1000
+        self.hbin_start = len(self.data)
+        self.data += bytearray(size)
+        struct.pack_into("<4sIIQQI", self.data, self.hbin_start, b"hbin", self.hbin_start, size, 0, 0, 0)
+        self.hbin_end = self.hbin_start + size
+        self.cursor = self.hbin_start + 0x20
+
+    def _cell(self, payload, allocated):
+        size = (len(payload) + 4 + 7) & ~7
+        if not self.data or self.cursor + size > self.hbin_end:
+            self._new_hbin(size)
+        offset = self.cursor
+        struct.pack_into("<i", self.data, offset, -size if allocated else size)
+        self.data[offset + 4:offset + 4 + len(payload)] = payload
+        self.cursor += size
+        return offset
+
+    def alloc(self, payload):
+        """Write an allocated cell and return its offset relative to the first HBIN."""
+        return self._cell(payload, True)
+
+    def free(self, payload):
+        """Write an unallocated cell, e.g. a deleted key left in slack space."""
+        return self._cell(payload, False)
+
+    def patch(self, cell_offset, field_offset, fmt, value):
+        struct.pack_into(fmt, self.data, cell_offset + 4 + field_offset, value)
+
+    def tobytes(self, root_offset, sequence=1, hive_name="SYNTHETIC"):
+        if self.cursor < self.hbin_end:
+            struct.pack_into("<i", self.data, self.cursor, self.hbin_end - self.cursor)
+            self.cursor = self.hbin_end
+
+        header = bytearray(0x1000)
+        struct.pack_into("<4sIIQIIIIIII", header, 0, b"regf", sequence, sequence, BASE_FILETIME,
+                         1, 5, 0, 1, root_offset, len(self.data), 1)
+        name = hive_name.encode("utf-16le")[:64]
+        header[0x30:0x30 + len(name)] = name
+        checksum = 0
+        for (dword,) in struct.iter_unpack("<I", bytes(header[:0x1FC])):
+            checksum ^= dword
+        struct.pack_into("<I", header, 0x1FC, checksum)
+        return bytes(header) + bytes(self.data)
+
+
+def nk_payload(name, timestamp, parent_offset=0, root=False):
+    name_bytes = name.encode("windows-1252")
+    flags = 0x20 | (0x2C if root else 0)
+    payload = bytearray(0x4C + len(name_bytes))
+    struct.pack_into("<2sHQIIIIIIIIIIIIIIIHH", payload, 0, b"nk", flags, timestamp, 0, parent_offset,
+                     0, 0, NO_OFFSET, NO_OFFSET, 0, NO_OFFSET, NO_OFFSET, NO_OFFSET,
+                     0, 0, 0, 0, 0, len(name_bytes), 0)
+    payload[0x4C:] = name_bytes
+    return bytes(payload)
+
+
+def encode_value(value):
+    if isinstance(value, bool) or isinstance(value, int):
+        return REG_DWORD, struct.pack("<I", value & 0xFFFFFFFF)
+    if isinstance(value, bytes):
+        return REG_BINARY, value
+    return REG_SZ, (str(value) + "\x00").encode("utf-16le")
+
+
+def write_value(writer, name, value, allocated=True):
+    data_type, data = encode_value(value)
+    name_bytes = name.encode("windows-1252")
+    write = writer.alloc if allocated else writer.free
+    if len(data) <= 4:
+        size, data_offset = len(data) | 0x80000000, struct.unpack("<I", data.ljust(4, b"\x00"))[0]
+    else:
+        size, data_offset = len(data), write(data)
+    payload = struct.pack("<2sHIIIHH", b"vk", len(name_bytes), size, data_offset, data_type, 1, 0) + name_bytes
+    return write(payload)
+
+
+def write_key(writer, name, node, parent_offset=0, root=False, timestamp=BASE_FILETIME):
+    """Recursively write a key; node is {"values": {...}, "subkeys": {...}, "timestamp": int}."""
+    timestamp = node.get("timestamp", timestamp)
+    nk_offset = writer.alloc(nk_payload(name, timestamp, parent_offset, root))
+
+    values = node.get("values", {})
+    if values:
+        value_offsets = [write_value(writer, value_name, value) for value_name, value in values.items()]
+        list_offset = writer.alloc(struct.pack(f"<{len(value_offsets)}I", *value_offsets))
+        writer.patch(nk_offset, 0x24, "<I", len(value_offsets))
+        writer.patch(nk_offset, 0x28, "<I", list_offset)
+
+    subkeys = node.get("subkeys", {})
+    if subkeys:
+        child_offsets = [(write_key(writer, child_name, child, nk_offset, timestamp=timestamp + 1), child_name)
+                         for child_name, child in subkeys.items()]
+        entries = b"".join(struct.pack("<I4s", offset, child_name.encode("windows-1252")[:4].ljust(4, b"\x00"))
+                           for offset, child_name in child_offsets)
+        list_offset = writer.alloc(struct.pack("<2sH", b"lf", len(child_offsets)) + entries)
+        writer.patch(nk_offset, 0x14, "<I", len(child_offsets))
+        writer.patch(nk_offset, 0x1C, "<I", list_offset)
+
+    return nk_offset
+
+
+def key_tree(paths):
+    """Turn {"A\\B": {"Value": 1}} into the nested node structure write_key expects."""
+    tree = {}
+    for path, values in paths.items():
+        node = {"subkeys": tree}
+        for part in path.split("\\"):
+            node = node["subkeys"].setdefault(part, {"subkeys": {}})
+        node.setdefault("values", {}).update(values)
+    return tree
+
+
+def filler_tree(key_count, depth, values_per_key=2, prefix="Key"):
+    """Build a tree of roughly key_count keys, depth levels deep."""
+    fanout = max(2, round(key_count ** (1.0 / max(depth, 1))))
+    counter = [0]
+
+    def build(level):
+        subkeys = {}
+        while counter[0] < key_count and len(subkeys) < fanout:
+            counter[0] += 1
+            index = counter[0]
+            node = {"values": {f"Value{v}": f"{prefix} {index} value {v}" for v in range(values_per_key)}}
+            if level + 1 < depth:
+                node["subkeys"] = build(level + 1)
+            subkeys[f"{prefix}{index:07d}"] = node
+        return subkeys
+
+    subkeys = {}
+    while counter[0] < key_count:
+        subkeys.update(build(0))
+    return subkeys
+
+
+def write_hive(path, tree, root_name="ROOT", hbin_size=HBIN_SIZE, sequence=1, deleted_keys=(), deleted_values=()):
+    """Write a hive file from a nested key tree; returns the root cell offset.
+
+    deleted_keys are (name, parent_offset, timestamp) and deleted_values are
+    (name, value); both are written as unallocated cells after the live tree,
+    so the live cells keep the offsets they would have without them.
+    """
+    writer = HiveWriter(hbin_size)
+    root_offset = write_key(writer, root_name, {"subkeys": tree}, root=True)
+    for name, parent_offset, timestamp in deleted_keys:
+        writer.free(nk_payload(name, timestamp, parent_offset))
+    for name, value in deleted_values:
+        write_value(writer, name, value, allocated=False)
+    with open(path, "wb") as f:
+        f.write(writer.tobytes(root_offset, sequence=sequence, hive_name=root_name))
+    return root_offset
+
+
+# Key paths that forensics_script.py reads, so synthetic images produce a full report
+def system_hive_paths():
+    return {
+        "Select": {"Current": 1},
+        "ControlSet001\\Control\\ComputerName\\ComputerName": {"ComputerName": "SYNTHETIC-PC"},
+        "ControlSet001\\Enum\\ACPI\\GenuineIntel_-_Intel64_Family_6_Model_142_-_Intel(R)_Core(TM)_i5-8365U_CPU_@_1.60GHz": {},
+        "ControlSet001\\Enum\\SCSI\\Disk&Ven_NVMe\\0000": {"FriendlyName": "@disk.inf;Synthetic NVMe SSD"},
+        "ControlSet001\\Control\\Windows": {"ShutdownTime": struct.pack("<Q", BASE_FILETIME)},
+        "ControlSet001\\Enum\\Root\\ACPI_HAL\\0000": {"DeviceDesc": "@hal.inf;ACPI x64-based PC"},
+        "ControlSet001\\Enum\\USBSTOR\\Disk&Ven_Synthetic&Prod_Flash&Rev_1.00\\0123456789&0": {
+            "FriendlyName": "Synthetic Flash USB Device"},
+        "ControlSet001\\Services\\SyntheticSvc": {"Start": 2, "ImagePath": "C:\\Windows\\synthetic.exe"},
+        "ControlSet001\\Services\\SyntheticDriver": {"Start": 3, "ImagePath": "System32\\drivers\\synthetic.sys"},
+        "HardwareConfig\\{00000000-0000-0000-0000-000000000000}": {
+            "SystemProductName": "Synthetic Model", "SystemManufacturer": "Synthetic Inc.",
+            "SystemSKU": "SKU-1", "SystemVersion": "1.0", "BIOSVendor": "Synthetic BIOS",
+            "BIOSVersion": "1.2.3", "BIOSReleaseDate": "01/01/2024",
+        },
+    }
+
+
+def software_hive_paths():
+    return {
+        "Microsoft\\Windows NT\\CurrentVersion": {
+            "ProductName": "Windows 10 Pro", "ReleaseId": "2009", "CurrentBuild": "19045", "DisplayVersion": "22H2",
+        },
+        "Microsoft\\Windows\\CurrentVersion\\Run": {"SyntheticAgent": "C:\\Program Files\\Synthetic\\agent.exe"},
+    }
+
+
+def sam_hive_paths(user_count=5):
+    return {f"SAM\\Domains\\Account\\Users\\Names\\User{i:02d}": {} for i in range(1, user_count + 1)}
+
+
+def security_hive_paths():
+    return {"Policy\\PolAdtEv": {}, "Policy\\PolAcDmS": {}, "Policy\\PolPrDmS": {}}
+
+
+def generate_image(folder_path, filler_keys=1000, depth=4):
+    """Write SOFTWARE, SAM, SYSTEM and SECURITY under folder_path/Windows/System32/config."""
+    config_dir = os.path.join(folder_path, "Windows", "System32", "config")
+    os.makedirs(config_dir, exist_ok=True)
+    hives = {
+        "SOFTWARE": software_hive_paths(),
+        "SAM": sam_hive_paths(),
+        "SYSTEM": system_hive_paths(),
+        "SECURITY": security_hive_paths(),
+    }
+    paths = {}
+    for hive_name, key_paths in hives.items():
+        tree = key_tree(key_paths)
+        tree.update(filler_tree(filler_keys, depth))
+        paths[hive_name] = os.path.join(config_dir, hive_name)
+        write_hive(paths[hive_name], tree, root_name=hive_name)
+    return paths
+
+
+# Microseconds since 1601-01-01 for 2024-01-01 00:00:00 UTC
+BASE_CHROME_TIME = 13348540800000000
+
+SAMPLE_DOMAINS = ("example.com", "news.example.org", "docs.python.org", "github.com", "google.com")
+SAMPLE_MALICIOUS = ("phishing.com", "login.phishing.com", "malware-test.com", "scam-example.org")
+
+CHROMIUM_SCHEMA = """
+CREATE TABLE urls(id INTEGER PRIMARY KEY AUTOINCREMENT, url LONGVARCHAR, title LONGVARCHAR,
+    visit_count INTEGER DEFAULT 0 NOT NULL, typed_count INTEGER DEFAULT 0 NOT NULL,
+    last_visit_time INTEGER NOT NULL, hidden INTEGER DEFAULT 0 NOT NULL);
+CREATE INDEX urls_url_index ON urls (url);
+CREATE TABLE visits(id INTEGER PRIMARY KEY AUTOINCREMENT, url INTEGER NOT NULL, visit_time INTEGER NOT NULL,
+    from_visit INTEGER, transition INTEGER DEFAULT 0 NOT NULL, segment_id INTEGER,
+    visit_duration INTEGER DEFAULT 0 NOT NULL);
+CREATE INDEX visits_url_index ON visits (url);
+CREATE INDEX visits_time_index ON visits (visit_time);
+"""
+
+
+def generate_history(path, url_count, visits_per_url=2, malicious_every=50, start_time=BASE_CHROME_TIME,
+                     expired_every=0):
+    """Write a Chromium-style History database with url_count URLs and their visits.
+
+    Every expired_every-th URL keeps its urls row but has no visits, like a
+    bookmarked URL whose visits Chromium has expired.
+    """
+    import sqlite3
+
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.executescript(CHROMIUM_SCHEMA)
+
+    def rows():
+        for i in range(1, url_count + 1):
+            if malicious_every and i % malicious_every == 0:
+                url = f"https://{SAMPLE_MALICIOUS[i % len(SAMPLE_MALICIOUS)]}/page/{i}"
+            else:
+                scheme = "http" if i % 7 == 0 else "https"
+                url = f"{scheme}://{SAMPLE_DOMAINS[i % len(SAMPLE_DOMAINS)]}/page/{i}"
+            yield i, url, f"Page {i}", visits_per_url, start_time + i * 1000000
+
+    conn.executemany("INSERT INTO urls (id, url, title, visit_count, last_visit_time) VALUES (?, ?, ?, ?, ?)", rows())
+    conn.executemany(
+        "INSERT INTO visits (url, visit_time) VALUES (?, ?)",
+        ((i, start_time + i * 1000000 - v * 1000) for i in range(1, url_count + 1) for v in range(visits_per_url)
+         if not (expired_every and i % expired_every == 0))
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    image = commands.add_parser("image", help="Write a synthetic image with all four system hives")
+    image.add_argument("folder_path")
+    image.add_argument("--keys", type=int, default=1000, help="Filler keys per hive")
+    image.add_argument("--depth", type=int, default=4, help="Depth of the filler key tree")
+
+    history = commands.add_parser("history", help="Write a synthetic Chromium History database")
+    history.add_argument("path")
+    history.add_argument("--urls", type=int, default=10000)
+    history.add_argument("--visits", type=int, default=2, help="Visits per URL")
+    history.add_argument("--malicious-every", type=int, default=50, help="Every Nth URL is on the blocklist")
+    args = parser.parse_args()
+
+    if args.command == "image":
+        for hive_name, hive_path in generate_image(args.folder_path, args.keys, args.depth).items():
+            print(f"{hive_name}: {hive_path} ({os.path.getsize(hive_path)} bytes)")
+    else:
+        generate_history(args.path, args.urls, args.visits, args.malicious_every)
+        print(f"{args.path} ({os.path.getsize(args.path)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
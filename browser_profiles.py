@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import argparse
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from history_table import load_history_table
+
+# Chromium-family user data directories, relative to a user's home folder
+CHROMIUM_BROWSERS = {
+    "Chrome": (
+        "AppData/Local/Google/Chrome/User Data",
+        ".config/google-chrome",
+        "Library/Application Support/Google/Chrome",
+    ),
+    "Edge": (
+        "AppData/Local/Microsoft/Edge/User Data",
+        ".config/microsoft-edge",
+        "Library/Application Support/Microsoft Edge",
+    ),
+    "Brave": (
+        "AppData/Local/BraveSoftware/Brave-Browser/User Data",
+        ".config/BraveSoftware/Brave-Browser",
+        "Library/Application Support/BraveSoftware/Brave-Browser",
+    ),
+    "Chromium": (
+        "AppData/Local/Chromium/User Data",
+        ".config/chromium",
+        "Library/Application Support/Chromium",
+    ),
+    "Vivaldi": (
+        "AppData/Local/Vivaldi/User Data",
+        ".config/vivaldi",
+    ),
+    "Opera": (
+        "AppData/Roaming/Opera Software/Opera Stable",
+        ".config/opera",
+    ),
+}
+
+# Firefox profile folders, relative to a user's home folder
+FIREFOX_PROFILE_DIRS = (
+    "AppData/Roaming/Mozilla/Firefox/Profiles",
+    ".mozilla/firefox",
+    "Library/Application Support/Firefox/Profiles",
+)
+
+# Folders that hold one home directory per user on a live system or a mounted image
+USER_CONTAINERS = ("Users", "home")
+
+
+def find_user_homes(root):
+    """Return (user, home) pairs; root may be one home folder or a system/image root."""
+    homes = []
+    for container in USER_CONTAINERS:
+        container_path = os.path.join(root, container)
+        if os.path.isdir(container_path):
+            with os.scandir(container_path) as it:
+                homes.extend((entry.name, entry.path) for entry in sorted(it, key=lambda e: e.name)
+                             if entry.is_dir(follow_symlinks=False))
+    return homes or [(os.path.basename(os.path.abspath(root)), root)]
+
+
+def profile_subdirs(path):
+    try:
+        with os.scandir(path) as it:
+            return sorted((entry for entry in it if entry.is_dir()), key=lambda e: e.name)
+    except OSError:
+        return []
+
+
+def discover_profiles(root):
+    """Find every Chromium-family and Firefox profile with a history database under root."""
+    profiles = []
+    for user, home in find_user_homes(root):
+        for browser, user_data_dirs in CHROMIUM_BROWSERS.items():
+            for user_data in user_data_dirs:
+                base = os.path.join(home, *user_data.split("/"))
+                # Opera keeps History directly in its user data folder
+                candidates = [(os.path.basename(base), base)]
+                candidates += [(entry.name, entry.path) for entry in profile_subdirs(base)]
+                for name, path in candidates:
+                    history_path = os.path.join(path, "History")
+                    if os.path.isfile(history_path):
+                        profiles.append({"browser": browser, "family": "chromium", "user": user,
+                                         "profile": name, "path": history_path})
+
+        for profile_dir in FIREFOX_PROFILE_DIRS:
+            for entry in profile_subdirs(os.path.join(home, *profile_dir.split("/"))):
+                places_path = os.path.join(entry.path, "places.sqlite")
+                if os.path.isfile(places_path):
+                    profiles.append({"browser": "Firefox", "family": "firefox", "user": user,
+                                     "profile": entry.name, "path": places_path})
+    return profiles
+
+
+def scan_profile(profile, limit=100, immutable=False):
+    start = time.perf_counter()
+    try:
+        table = load_history_table(profile["path"], limit, profile["family"], profile["browser"], immutable)
+        result = table.to_result()
+    except Exception as e:
+        result = {"browser": profile["browser"], "error": str(e)}
+    result.update({"user": profile["user"], "profile": profile["profile"], "path": profile["path"],
+                   "seconds": round(time.perf_counter() - start, 4)})
+    return result
+
+
+def scan_all_profiles(root, limit=100, workers=8, immutable=False, processes=False):
+    """Scan every profile under root in parallel and merge the results into one report.
+
+    Threads overlap the SQLite reads; processes=True also spreads the per-row
+    checks across cores when large limits make the scan CPU-bound.
+    """
+    start = time.perf_counter()
+    profiles = discover_profiles(root)
+
+    executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor(max_workers=max(1, min(workers, len(profiles) or 1))) as pool:
+        results = list(pool.map(partial(scan_profile, limit=limit, immutable=immutable), profiles))
+
+    malicious_sites = []
+    for result in results:
+        for hit in result.get("malicious_sites", []):
+            malicious_sites.append({**hit, "browser": result["browser"], "user": result["user"],
+                                    "profile": result["profile"]})
+
+    report = {
+        "root": root,
+        "profiles_scanned": len(results),
+        "history_checked": sum(result.get("history_checked", 0) for result in results),
+        "seconds": round(time.perf_counter() - start, 4),
+        "slowest_profile_seconds": max((result["seconds"] for result in results), default=0.0),
+        "profiles": results,
+    }
+    if malicious_sites:
+        report["malicious_sites"] = malicious_sites
+    else:
+        report["message"] = "You didn't visit any malicious website!"
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan every browser profile under a user or image root.")
+    parser.add_argument("root", nargs="?", default=os.path.expanduser("~"),
+                        help="Home folder, or a system/mounted image root containing Users/ or home/")
+    parser.add_argument("--limit", type=int, default=100, help="Newest rows to check per profile")
+    parser.add_argument("--workers", type=int, default=8, help="Profiles scanned in parallel")
+    parser.add_argument("--immutable", action="store_true",
+                        help="Open databases as immutable; only for images no browser is writing")
+    parser.add_argument("--processes", action="store_true", help="Scan profiles in worker processes instead of threads")
+    args = parser.parse_args()
+
+    report = scan_all_profiles(args.root, limit=args.limit, workers=args.workers, immutable=args.immutable,
+                               processes=args.processes)
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,20 @@
 import os
+import sys
+import time
 import sqlite3
 import shutil
 import json
+import argparse
+import tempfile
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from urllib.request import pathname2url
 from datetime import datetime, timedelta
 from urllib.parse import urlparse
+from domain_index import DomainIndex, ALLOWED
+from metrics import span, record, ROWS_SCANNED
 
 # Example malicious domains (expand this as needed)
 MALICIOUS_DOMAINS = {
@@ -17,82 +28,504 @@ UNMALICOUS_DOMAINS = {
     "google.com",
 }
 
+# Optional threat-feed index built with "python domain_index.py build"
+DOMAIN_INDEX_FILE = os.environ.get("DOMAIN_INDEX", "domain_index.bin")
+
+# A rebuilt feed is picked up without a restart; its file is stat'ed at most this often
+DOMAIN_INDEX_CHECK_SECONDS = 1.0
+
+_builtin_index = None
+_domain_indexes = None
+_feed_signature = None
+_feed_checked = 0.0
+_verdict_version = None
+_domain_indexes_lock = threading.Lock()
+
+
+def feed_signature():
+    """(mtime_ns, size) of the feed index file, or None if there is none."""
+    try:
+        stat = os.stat(DOMAIN_INDEX_FILE)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def get_domain_indexes():
+    """Built-in lists first, then the memory-mapped feed index if one has been built.
+
+    The feed is reopened whenever its file's mtime or size changes.
+    """
+    global _builtin_index, _domain_indexes, _feed_signature, _feed_checked, _verdict_version
+    now = time.monotonic()
+    if _domain_indexes is not None and now - _feed_checked < DOMAIN_INDEX_CHECK_SECONDS:
+        return _domain_indexes
+    with _domain_indexes_lock:
+        signature = feed_signature()
+        if _domain_indexes is None or signature != _feed_signature:
+            if _builtin_index is None:
+                _builtin_index = DomainIndex.from_entries(MALICIOUS_DOMAINS.items(), UNMALICOUS_DOMAINS)
+            indexes = [_builtin_index]
+            if signature is not None:
+                try:
+                    indexes.append(DomainIndex.open(DOMAIN_INDEX_FILE))
+                except (OSError, ValueError) as e:
+                    # Not retried until the file changes again
+                    print(f"Could not open domain index {DOMAIN_INDEX_FILE}: {e}")
+            # Stored verdicts carry this, so they can tell which lists produced them
+            _domain_indexes, _feed_signature = indexes, signature
+            _verdict_version = "-".join(index.digest() for index in indexes)
+        _feed_checked = now
+    return _domain_indexes
+
+
+def verdict_version():
+    """Identifies the domain lists behind host_reason; changes whenever a list or the feed index does."""
+    get_domain_indexes()
+    return _verdict_version
+
+
+def host_reason(domain, scheme):
+    """The verdict for a URL's hostname and scheme; is_malicious without the parsing."""
+    # Rule 1: Check domain blacklist, matching subdomains of listed domains too. The most
+    # specific suffix listed in any index decides, so a feed entry for a subdomain of an
+    # allowlisted domain still blocks; on a tie the earlier index wins
+    if domain:
+        best = None
+        for index in get_domain_indexes():
+            found = index.match(domain)
+            if found and (best is None or found[0] > best[0]):
+                best = found
+        if best and best[1] is not ALLOWED:
+            return best[1]
+
+    # Rule 2: Flag all non-HTTPS traffic
+    if scheme == "http":
+        return "Unencrypted HTTP connection (insecure)"
+
+    return None
+
+
 def is_malicious(url):
     """Check if URL domain is in the malicious list or if it uses plain HTTP."""
     try:
         parsed = urlparse(url)
-        domain = parsed.netloc.lower()
-
-        # Rule 1: Check domain blacklist
-        if domain in MALICIOUS_DOMAINS:
-            return MALICIOUS_DOMAINS[domain]
-
-        # Rule 2: Flag all non-HTTPS traffic
-        if parsed.scheme == "http":
-            return "Unencrypted HTTP connection (insecure)"
-        
+        # hostname drops the port and credentials, so phishing.com:443 still matches
+        return host_reason(parsed.hostname or "", parsed.scheme)
     except Exception:
         return None
 
+
+# Rows fetched from SQLite per step when streaming the whole history
+BATCH_SIZE = 1000
+
+# Entries per page of the paginated history API
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Sorted (last_visit_time, id) keys of the urls table per History file, for paging newest first.
+# Chromium has no index on urls.last_visit_time, and the visits_time_index misses URLs whose last
+# visit has expired from visits, so the keys are read once and then patched as the file changes
+HISTORY_KEY_CACHE_SIZE = 4
+
+_history_keys = {}
+_history_keys_lock = threading.Lock()
+
+MAX_CURSOR = 2 ** 63 - 1
+
+# Brave uses Chrome time format: microseconds since 1601-01-01
+def chrome_time_to_datetime(chrome_time):
+    if chrome_time:
+        return datetime(1601, 1, 1) + timedelta(microseconds=chrome_time)
     return None
 
 
-def parse_brave_history(limit=50):
+# Firefox stores microseconds since 1970-01-01
+def firefox_time_to_datetime(firefox_time):
+    if firefox_time:
+        return datetime(1970, 1, 1) + timedelta(microseconds=firefox_time)
+    return None
+
+
+def brave_history_path():
     user_profile = os.path.expanduser("~")
-    history_path = os.path.join(
+    return os.path.join(
         user_profile,
         r"AppData\Local\BraveSoftware\Brave-Browser\User Data\Default\History"
     )
 
-    if not os.path.exists(history_path):
-        return {"error": "Brave history not found"}
 
-    # Copy to temp file to avoid lock errors
-    temp_path = "temp_brave_history.db"
-    shutil.copy2(history_path, temp_path)
+# Once the database is open in place, wait this long for a browser's write lock instead of failing mid-scan
+HISTORY_BUSY_TIMEOUT = 2.0
 
-    conn = sqlite3.connect(temp_path)
-    cursor = conn.cursor()
+# Primary result codes of SQLITE_BUSY and SQLITE_LOCKED
+LOCK_ERROR_CODES = (5, 6)
 
-    # Brave uses Chrome time format: microseconds since 1601-01-01
-    def chrome_time_to_datetime(chrome_time):
-        if chrome_time:
-            return datetime(1601, 1, 1) + timedelta(microseconds=chrome_time)
-        return None
 
-    cursor.execute(f"""
-        SELECT urls.url, urls.title, urls.last_visit_time
-        FROM urls
-        ORDER BY last_visit_time DESC
-        LIMIT {limit}
-    """)
+def is_lock_error(error):
+    """True if an OperationalError means another connection holds a lock."""
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in LOCK_ERROR_CODES
+    # Before Python 3.11 only the message tells
+    return "locked" in str(error)
 
-    history_data = []
-    malicious_hits = []
 
-    for url, title, last_visit_time in cursor.fetchall():
-        visit_time = chrome_time_to_datetime(last_visit_time).isoformat()
-        entry = {
-            "url": url,
-            "title": title,
-            "last_visit": visit_time
-        }
-        history_data.append(entry)
+def history_temp_dir():
+    # Prefer a RAM-backed directory for the fallback copy when the platform has one
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
 
-        reason = is_malicious(url)
-        if reason:
-            malicious_hits.append({
+
+@contextmanager
+def open_history(history_path, immutable=False, table="urls"):
+    """Open a History database read-only in place, copying it only if the browser holds a lock.
+
+    immutable=True also tells SQLite the file cannot change, which skips locking
+    entirely; only use it for databases no browser is writing, e.g. mounted images.
+    """
+    uri = "file:" + pathname2url(os.path.abspath(history_path)) + "?mode=ro"
+    if immutable:
+        uri += "&immutable=1"
+
+    conn = None
+    temp_path = None
+    try:
+        with span("history_open"):
+            conn = sqlite3.connect(uri, uri=True, timeout=0)
+            # Touch the schema now so a locked database is detected before streaming starts
+            conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchall()
+            conn.execute(f"PRAGMA busy_timeout = {int(HISTORY_BUSY_TIMEOUT * 1000)}")
+    except sqlite3.OperationalError as e:
+        if conn is not None:
+            conn.close()
+        # A missing table or a corrupt file would fail on the copy too
+        if not is_lock_error(e):
+            raise
+        # Copy to a uniquely named temp file so concurrent scans never share one
+        with span("history_copy"):
+            fd, temp_path = tempfile.mkstemp(prefix="history-", suffix=".db", dir=history_temp_dir())
+            os.close(fd)
+            shutil.copy2(history_path, temp_path)
+            conn = sqlite3.connect(temp_path)
+
+    try:
+        yield conn
+    finally:
+        conn.close()
+        if temp_path:
+            os.remove(temp_path)
+
+
+def scan_rows(cursor, to_datetime, batch_size=BATCH_SIZE, stats=None):
+    """Check (url, title, visit_time) rows from an executed cursor batch by batch.
+
+    Entries flagged by is_malicious carry a "reason". Fetch and check times are
+    accumulated into the optional stats dict.
+    """
+    while True:
+        fetch_start = time.perf_counter()
+        rows = cursor.fetchmany(batch_size)
+        check_start = time.perf_counter()
+        if not rows:
+            break
+
+        batch = []
+        malicious = 0
+        for url, title, last_visit_time in rows:
+            visit_time = to_datetime(last_visit_time)
+            entry = {
                 "url": url,
                 "title": title,
-                "last_visit": visit_time,
-                "reason": reason
-            })
+                "last_visit": visit_time.isoformat() if visit_time else None
+            }
+            reason = is_malicious(url)
+            if reason:
+                entry["reason"] = reason
+                malicious += 1
+            batch.append(entry)
+
+        check_end = time.perf_counter()
+        record("history_fetch", check_start - fetch_start)
+        record("history_check", check_end - check_start)
+        ROWS_SCANNED.inc(len(rows))
+        if stats is not None:
+            stats["rows"] = stats.get("rows", 0) + len(rows)
+            stats["malicious"] = stats.get("malicious", 0) + malicious
+            stats["fetch_seconds"] = stats.get("fetch_seconds", 0.0) + (check_start - fetch_start)
+            stats["check_seconds"] = stats.get("check_seconds", 0.0) + (check_end - check_start)
+
+        yield from batch
+
+
+def iter_brave_history(limit=None, batch_size=BATCH_SIZE, stats=None, history_path=None, immutable=False):
+    """Yield entries from a Chromium-family History database, Brave's Default profile by default.
+
+    Without a limit the whole urls table is streamed in storage order, so memory
+    stays constant however large the database is.
+    """
+    history_path = history_path or brave_history_path()
+
+    with open_history(history_path, immutable) as conn:
+        cursor = conn.cursor()
+        if limit is None:
+            cursor.execute("SELECT url, title, last_visit_time FROM urls")
+        else:
+            cursor.execute("""
+                SELECT urls.url, urls.title, urls.last_visit_time
+                FROM urls
+                ORDER BY last_visit_time DESC
+                LIMIT ?
+            """, (limit,))
+        yield from scan_rows(cursor, chrome_time_to_datetime, batch_size, stats)
+
+
+def iter_firefox_history(places_path, limit=None, batch_size=BATCH_SIZE, stats=None, immutable=False):
+    """Yield entries from a Firefox places.sqlite database."""
+    with open_history(places_path, immutable, table="moz_places") as conn:
+        cursor = conn.cursor()
+        if limit is None:
+            cursor.execute("SELECT url, title, last_visit_date FROM moz_places")
+        else:
+            cursor.execute("""
+                SELECT url, title, last_visit_date
+                FROM moz_places
+                ORDER BY last_visit_date DESC
+                LIMIT ?
+            """, (limit,))
+        yield from scan_rows(cursor, firefox_time_to_datetime, batch_size, stats)
+
+
+def history_version(history_path):
+    """(mtime_ns, size) of the database and its WAL; changes whenever the browser writes."""
+    version = []
+    for path in (history_path, history_path + "-wal"):
+        try:
+            stat = os.stat(path)
+            version.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            version.append(None)
+    return tuple(version)
 
-    conn.close()
-    os.remove(temp_path)
+
+def key_position(times, ids, visit_time, url_id):
+    """Index of the first key >= (visit_time, url_id); ids are ascending within one visit time."""
+    low = bisect_left(times, visit_time)
+    return bisect_left(ids, url_id, low, bisect_right(times, visit_time, low))
+
+
+class HistoryKeys:
+    """Ascending (last_visit_time, id) keys for every row of urls, as two parallel arrays.
+
+    Reading them is one scan of urls (about 70 ms per 100k URLs). After that,
+    a change to the file is applied by patching: rows added since (id above
+    max_id) and rows revisited since (visits at or after visit_mark, found
+    through visits_time_index) are moved into place, so a live profile costs a
+    few indexed lookups per page instead of another scan. Instances are never
+    modified; patching returns a new one, so readers need no lock.
+    """
+
+    def __init__(self, version, times, ids, time_by_id, visit_mark):
+        self.version = version
+        self.times = times
+        self.ids = ids
+        # last_visit_time per url id, -1 for ids not in urls
+        self.time_by_id = time_by_id
+        self.visit_mark = visit_mark
+
+    @property
+    def max_id(self):
+        return len(self.time_by_id) - 1
+
+    @classmethod
+    def read(cls, conn, version):
+        # Read the mark first: a visit landing during the scan is only checked twice
+        visit_mark = latest_visit_time(conn)
+        rows = sorted(conn.execute("SELECT COALESCE(last_visit_time, 0), id FROM urls"))
+        time_by_id = array("q", [-1]) * (max((url_id for _, url_id in rows), default=0) + 1)
+        for visit_time, url_id in rows:
+            time_by_id[url_id] = visit_time
+        return cls(version, array("q", (visit_time for visit_time, _ in rows)),
+                   array("q", (url_id for _, url_id in rows)), time_by_id, visit_mark)
+
+    def refresh(self, conn, version):
+        """Keys for the file's current version, patched from the rows added or revisited since."""
+        max_id = conn.execute("SELECT MAX(id) FROM urls").fetchone()[0] or 0
+        if max_id < self.max_id:
+            # Newest rows deleted or the file replaced; ids may be reused
+            return HistoryKeys.read(conn, version)
+        visit_mark = latest_visit_time(conn)
+        changed = conn.execute("""
+            SELECT id, COALESCE(last_visit_time, 0) FROM urls WHERE id > ?
+            UNION
+            SELECT id, COALESCE(last_visit_time, 0) FROM urls
+            WHERE id IN (SELECT url FROM visits WHERE visit_time >= ?)
+        """, (self.max_id, self.visit_mark)).fetchall()
+        return self.patched(changed, version, visit_mark)
+
+    def patched(self, changed, version=None, visit_mark=None):
+        """A copy with each (id, last_visit_time) in changed moved into place; a time of None drops the id."""
+        changed = [(url_id, visit_time) for url_id, visit_time in changed
+                   if self.time(url_id) != (-1 if visit_time is None else visit_time)]
+        time_by_id = array("q", self.time_by_id)
+        top = max((url_id for url_id, _ in changed), default=0)
+        if top > self.max_id:
+            time_by_id.extend([-1] * (top - self.max_id))
+
+        # Drop the old keys, then insert the new ones, copying the unchanged runs between them
+        drop = sorted(key_position(self.times, self.ids, self.time_by_id[url_id], url_id)
+                      for url_id, _ in changed if self.time(url_id) >= 0)
+        times, ids = array("q"), array("q")
+        previous = 0
+        for position in drop:
+            times += self.times[previous:position]
+            ids += self.ids[previous:position]
+            previous = position + 1
+        times += self.times[previous:]
+        ids += self.ids[previous:]
+
+        merged_times, merged_ids = array("q"), array("q")
+        previous = 0
+        for visit_time, url_id in sorted((visit_time, url_id) for url_id, visit_time in changed
+                                         if visit_time is not None):
+            position = key_position(times, ids, visit_time, url_id)
+            merged_times += times[previous:position]
+            merged_ids += ids[previous:position]
+            merged_times.append(visit_time)
+            merged_ids.append(url_id)
+            previous = position
+        merged_times += times[previous:]
+        merged_ids += ids[previous:]
+
+        for url_id, visit_time in changed:
+            time_by_id[url_id] = -1 if visit_time is None else visit_time
+        return HistoryKeys(self.version if version is None else version, merged_times, merged_ids, time_by_id,
+                           self.visit_mark if visit_mark is None else visit_mark)
+
+    def time(self, url_id):
+        return self.time_by_id[url_id] if 0 <= url_id < len(self.time_by_id) else -1
+
+
+def latest_visit_time(conn):
+    return conn.execute("SELECT MAX(visit_time) FROM visits").fetchone()[0] or 0
+
+
+def cache_history_keys(key, keys):
+    with _history_keys_lock:
+        _history_keys.pop(key, None)
+        while len(_history_keys) >= HISTORY_KEY_CACHE_SIZE:
+            del _history_keys[next(iter(_history_keys))]
+        _history_keys[key] = keys
+
+
+def history_keys(conn, history_path):
+    """HistoryKeys for the file's current version: cached, patched from the last version, or read."""
+    key = os.path.abspath(history_path)
+    version = history_version(key)
+    with _history_keys_lock:
+        cached = _history_keys.get(key)
+    if cached and cached.version == version:
+        return cached
+
+    with span("history_keys"):
+        keys = cached.refresh(conn, version) if cached else HistoryKeys.read(conn, version)
+    cache_history_keys(key, keys)
+    return keys
+
+
+def history_page(after=None, after_id=None, limit=PAGE_SIZE, history_path=None, immutable=False):
+    """Return one newest-first page of Chromium history and the cursor for the next one.
+
+    Pages are keyed on (last_visit_time, id): after alone continues strictly
+    before that time, after_id breaks ties between URLs visited in the same
+    microsecond. Every row of urls is listed, as in export_history_json. Each
+    page costs a bisect and one lookup by primary key per row, plus a patch
+    of the keys when the file has changed since the last page. Rows that
+    changed some other way (deleted, or a visit expired) are noticed when
+    their page is read, fixed in the keys, and the page is served again.
+    """
+    history_path = history_path or brave_history_path()
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if after is None:
+        after, after_id = MAX_CURSOR, MAX_CURSOR
+    elif after_id is None:
+        after_id = 0
+
+    with open_history(history_path, immutable) as conn:
+        keys = history_keys(conn, history_path)
+        with span("history_page"):
+            # Each pass fixes at least one key; rows moved into the page may be stale too
+            while True:
+                # Keys before end are < (after, after_id)
+                end = key_position(keys.times, keys.ids, after, after_id)
+                start = max(0, end - limit)
+                page_ids = keys.ids[start:end][::-1]
+                placeholders = ",".join("?" * len(page_ids))
+                rows = dict((row[0], row) for row in conn.execute(
+                    f"SELECT id, url, title, last_visit_time FROM urls WHERE id IN ({placeholders})",
+                    list(page_ids))) if page_ids else {}
+                stale = [(url_id, (rows[url_id][3] or 0) if url_id in rows else None) for url_id in page_ids
+                         if url_id not in rows or (rows[url_id][3] or 0) != keys.time_by_id[url_id]]
+                if not stale:
+                    break
+                keys = keys.patched(stale)
+                cache_history_keys(os.path.abspath(history_path), keys)
+        times, ids = keys.times, keys.ids
+
+    entries = []
+    for url_id in page_ids:
+        _, url, title, last_visit_time = rows[url_id]
+        visit_time = chrome_time_to_datetime(last_visit_time)
+        entry = {"url": url, "title": title, "last_visit": visit_time.isoformat() if visit_time else None}
+        reason = is_malicious(url)
+        if reason:
+            entry["reason"] = reason
+        entries.append(entry)
+    ROWS_SCANNED.inc(len(rows))
+
+    next_cursor = None
+    if start > 0:
+        next_cursor = {"after": times[start], "after_id": ids[start]}
+    return entries, next_cursor
+
+
+def export_history_json(out_path, history_path=None, immutable=False):
+    """Scan the full history into a compact scan report at out_path; returns the entry count.
+
+    Rows are held in a HistoryTable and serialized one entry at a time. Written
+    to a temporary name and swapped in, so readers never see a partial file.
+    """
+    # history_table builds on this module
+    from history_table import load_history_table
+
+    history_path = history_path or brave_history_path()
+    table = load_history_table(history_path, immutable=immutable)
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as out:
+            count = table.write_json(out)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, out_path)
+    return count
+
+
+def build_scan_result(entries, browser="Brave"):
+    """Collect scanned entries into the report shape the templates render."""
+    history_data = []
+    malicious_hits = []
+
+    for entry in entries:
+        reason = entry.pop("reason", None)
+        history_data.append(entry)
+        if reason:
+            malicious_hits.append({**entry, "reason": reason})
 
     result = {
-        "browser": "Brave",
+        "browser": browser,
         "history_checked": len(history_data),
         "history": history_data
     }
@@ -104,6 +537,67 @@ def parse_brave_history(limit=50):
 
     return result
 
+
+def parse_brave_history(limit=50):
+    # history_table builds on this module
+    from history_table import load_history_table
+
+    history_path = brave_history_path()
+
+    if not os.path.exists(history_path):
+        return {"error": "Brave history not found"}
+
+    return load_history_table(history_path, limit).to_result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan Brave browsing history for malicious sites.")
+    parser.add_argument("--limit", type=int, default=100, help="Newest rows to check (default mode)")
+    parser.add_argument("--all", action="store_true", help="Stream the full history as NDJSON instead")
+    parser.add_argument("--history", help="Path to a History database (defaults to Brave's Default profile)")
+    parser.add_argument("--immutable", action="store_true",
+                        help="Open the database as immutable; only for copies no browser is writing")
+    parser.add_argument("-o", "--output", help="Write NDJSON here instead of stdout")
+    parser.add_argument("--export", metavar="PATH", help="Write the full scan report as compact JSON to PATH")
+    args = parser.parse_args()
+
+    if args.export:
+        history_path = args.history or brave_history_path()
+        if not os.path.exists(history_path):
+            print(json.dumps({"error": "Brave history not found"}))
+            sys.exit(1)
+        count = export_history_json(args.export, history_path, args.immutable)
+        print(f"{count} entries written to {args.export}", file=sys.stderr)
+        return
+
+    if not args.all:
+        brave_history = parse_brave_history(limit=args.limit)
+        print(json.dumps(brave_history, indent=4))
+        return
+
+    history_path = args.history or brave_history_path()
+    if not os.path.exists(history_path):
+        print(json.dumps({"error": "Brave history not found"}))
+        sys.exit(1)
+
+    stats = {}
+    start = time.perf_counter()
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for entry in iter_brave_history(stats=stats, history_path=history_path, immutable=args.immutable):
+            out.write(json.dumps(entry) + "\n")
+    finally:
+        if args.output:
+            out.close()
+
+    # Cost of checking every row, reported separately from the SQLite fetches
+    elapsed = time.perf_counter() - start
+    rows = stats.get("rows", 0)
+    print(f"{rows} rows, {stats.get('malicious', 0)} flagged in {elapsed:.3f}s "
+          f"({rows / elapsed if elapsed else 0:.0f} rows/sec); "
+          f"fetch {stats.get('fetch_seconds', 0.0):.3f}s, check {stats.get('check_seconds', 0.0):.3f}s "
+          f"({stats.get('check_seconds', 0.0) / rows * 1e6 if rows else 0:.2f} us/row)", file=sys.stderr)
+
+
 if __name__ == "__main__":
-    brave_history = parse_brave_history(limit=100)
-    print(json.dumps(brave_history, indent=4))
+    main()
@@ -12,12 +12,38 @@ Saves Windows registry hives:
 Default output folder: %USERPROFILE%\Downloads\RegisFile
 
 Requires Administrator privileges.
+
+The raw copies from %SystemRoot%\System32\config are read once each, in large
+chunks that feed SHA-256, optional gzip/lzma compression and the output file
+together; the four hives are copied concurrently and described in
+manifest.json. --raw-only skips "reg save" and the Windows/admin checks, so the
+copy stage also runs elsewhere against SystemRoot=<fixture dir>.
 """
 
 import os
 import sys
+import json
+import lzma
+import time
+import zlib
+import hashlib
+import argparse
 import subprocess
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+HIVE_FILES = ["SAM", "SECURITY", "SOFTWARE", "SYSTEM"]
+
+# Bytes read per step; hashing, compression and writing all work on the same buffer
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# Compressed copy suffix and compressor factory; each compressor has compress() and flush()
+COMPRESSORS = {
+    "gzip": (".gz", lambda: zlib.compressobj(6, zlib.DEFLATED, 31)),
+    "lzma": (".xz", lambda: lzma.LZMACompressor(lzma.FORMAT_XZ)),
+}
+
+MANIFEST_FILE = "manifest.json"
 
 def is_windows():
     return os.name == 'nt'
@@ -47,33 +73,121 @@ def run_reg_save(key, dest_path):
     proc = subprocess.run(cmd, capture_output=True, text=True, shell=False)
     return proc.returncode, proc.stdout, proc.stderr
 
-def try_copy_config_file(filename, dest_path):
-    src = os.path.join(os.environ.get("SystemRoot", r"C:\\Windows"), "System32", "config", filename)
+def config_file_path(filename):
+    return os.path.join(os.environ.get("SystemRoot", r"C:\\Windows"), "System32", "config", filename)
+
+def stream_copy(src, dest_path, compression=None, chunk_size=CHUNK_SIZE):
+    """Copy src to dest_path in one read pass, hashing (and optionally compressing) on the way.
+
+    The copy is written to dest_path + ".partial" and only renamed into place
+    once complete, so a failed copy never leaves a truncated file that looks
+    like a hive.
+    """
+    digest = hashlib.sha256()
+    compressor = COMPRESSORS[compression][1]() if compression else None
+    buf = bytearray(max(1, min(chunk_size, os.path.getsize(src))))
+    view = memoryview(buf)
+    size = 0
+    written = 0
+    partial_path = dest_path + ".partial"
+    start = time.perf_counter()
+    try:
+        with open(src, "rb", buffering=0) as fin, open(partial_path, "wb") as fout:
+            while True:
+                n = fin.readinto(buf)
+                if not n:
+                    break
+                chunk = view[:n]
+                digest.update(chunk)
+                data = compressor.compress(chunk) if compressor else chunk
+                fout.write(data)
+                size += n
+                written += len(data)
+            if compressor:
+                data = compressor.flush()
+                fout.write(data)
+                written += len(data)
+        seconds = time.perf_counter() - start
+        shutil.copystat(src, partial_path)
+        os.replace(partial_path, dest_path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    return {
+        "source": src,
+        "path": dest_path,
+        "sha256": digest.hexdigest(),
+        "bytes": size,
+        "written_bytes": written,
+        "compression": compression,
+        "seconds": round(seconds, 4),
+        "mb_per_sec": round(size / 1e6 / seconds, 1) if seconds else None,
+    }
+
+def try_copy_config_file(filename, dest_path, compression=None):
+    src = config_file_path(filename)
     if os.path.exists(src):
         try:
-            shutil.copy2(src, dest_path)
-            return True, None
+            return True, stream_copy(src, dest_path, compression)
         except Exception as e:
             return False, str(e)
     else:
         return False, "source file not found: " + src
 
+def export_config_files(out_folder, filenames=HIVE_FILES, compression=None, workers=4):
+    """Copy the raw hives concurrently and write a manifest; returns the manifest."""
+    suffix = ".raw" + (COMPRESSORS[compression][0] if compression else "")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(filenames)))) as pool:
+        futures = {fname: pool.submit(try_copy_config_file, fname, os.path.join(out_folder, fname + suffix),
+                                      compression) for fname in filenames}
+    files = {}
+    for fname, future in futures.items():
+        ok, info = future.result()
+        files[fname] = info if ok else {"error": info}
+    seconds = time.perf_counter() - start
+
+    total = sum(entry.get("bytes", 0) for entry in files.values())
+    manifest = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config_dir": os.path.dirname(config_file_path("")),
+        "compression": compression,
+        "files": files,
+        "total_bytes": total,
+        "seconds": round(seconds, 4),
+        "mb_per_sec": round(total / 1e6 / seconds, 1) if seconds else None,
+    }
+    with open(os.path.join(out_folder, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=4)
+    return manifest
+
 def main():
-    if not is_windows():
-        print("This script only runs on Windows.")
-        sys.exit(1)
-
-    if not is_admin():
-        print("Administrator privileges required. Attempting to relaunch with elevation...")
-        if relaunch_as_admin():
-            sys.exit(0)  # elevated instance will continue
-        else:
-            print("Could not elevate. Please run this script as Administrator.")
+    parser = argparse.ArgumentParser(description="Save the registry hives and copy the raw hive files.")
+    parser.add_argument("out_folder", nargs="?", help="Output folder (default: Downloads\\RegisFile)")
+    parser.add_argument("--compress", choices=sorted(COMPRESSORS), help="Compress the raw copies")
+    parser.add_argument("--workers", type=int, default=4, help="Raw hives copied at once")
+    parser.add_argument("--raw-only", action="store_true",
+                        help="Only copy the raw files from %%SystemRoot%%\\System32\\config (no reg save)")
+    args = parser.parse_args()
+
+    # Copying the raw files needs neither reg.exe nor (for fixtures) elevation
+    if not args.raw_only:
+        if not is_windows():
+            print("This script only runs on Windows.")
             sys.exit(1)
 
+        if not is_admin():
+            print("Administrator privileges required. Attempting to relaunch with elevation...")
+            if relaunch_as_admin():
+                sys.exit(0)  # elevated instance will continue
+            else:
+                print("Could not elevate. Please run this script as Administrator.")
+                sys.exit(1)
+
     # Default output folder: Downloads\RegisFile
-    if len(sys.argv) >= 2:
-        out_folder = sys.argv[1]
+    if args.out_folder:
+        out_folder = args.out_folder
     else:
         downloads = os.path.join(os.path.expanduser("~"), "Downloads")
         out_folder = os.path.join(downloads, "RegisFile")
@@ -95,6 +209,8 @@ def main():
     results = {}
 
     for regkey, fname in hives.items():
+        if args.raw_only:
+            break
         destfile = os.path.join(out_folder, fname)  # no .hiv extension
         print(f"\nSaving {regkey} -> {destfile} ...")
         ret, out, err = run_reg_save(regkey, destfile)
@@ -110,13 +226,14 @@ def main():
 
     # Optional: attempt to copy raw files
     print("\nAttempting to copy raw hive files from %SystemRoot%\\System32\\config (optional; may fail if locked):")
-    for fname in ["SAM", "SECURITY", "SOFTWARE", "SYSTEM"]:
-        dest = os.path.join(out_folder, fname + ".raw")
-        ok, info = try_copy_config_file(fname, dest)
-        if ok:
-            print(f"  Copied {fname} to {dest}")
+    manifest = export_config_files(out_folder, compression=args.compress, workers=args.workers)
+    for fname, info in manifest["files"].items():
+        if "error" not in info:
+            print(f"  Copied {fname} to {info['path']} ({info['bytes']} bytes, {info['mb_per_sec']} MB/s, "
+                  f"sha256 {info['sha256']})")
         else:
-            print(f"  Could not copy {fname}: {info}")
+            print(f"  Could not copy {fname}: {info['error']}")
+    print(f"  Manifest: {os.path.join(out_folder, MANIFEST_FILE)}")
 
     # Summary
     print("\nSummary:")
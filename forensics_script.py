@@ -1,6 +1,13 @@
-import sys
 import os
 import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from hive_cache import HiveResultCache, fingerprint_hive, HASH_MODES
+from hive_visitors import KeyVisitor, register_visitor, extract_hive, is_clean_run
+from snapshot_store import record_snapshot
+from metrics import span, record, HIVE_PARSE_SECONDS
 from Registry import Registry
 from datetime import datetime, timezone
 
@@ -8,196 +15,546 @@ from datetime import datetime, timezone
 def filetime_to_datetime(filetime):
     return datetime.fromtimestamp((filetime - 116444736000000000) / 10000000, timezone.utc)
 
+# Hives located by the single-pass walk
+SYSTEM_HIVE_NAMES = ("SOFTWARE", "SAM", "SYSTEM", "SECURITY")
+USER_HIVE_NAMES = ("NTUSER.DAT", "UsrClass.dat")
+HIVE_LOG_SUFFIXES = (".LOG1", ".LOG2")
+# Folders holding one directory per user profile, where new user hives appear
+PROFILE_FOLDER_NAMES = ("users", "documents and settings")
+
+# Per-image locator results, one small JSON file per image root; least recently used roots are evicted
+HIVE_INDEX_DIR = "hive_index"
+HIVE_INDEX_MAX_ROOTS = 64
+# An index file's mtime is only refreshed when older than this, so a warm lookup stays read-only
+HIVE_INDEX_TOUCH_SECONDS = 3600
+
+# Walk the image folder once and record every hive we care about
+def build_hive_index(folder_path):
+    root_path = os.path.abspath(folder_path)
+    user_names = {name.lower(): name for name in USER_HIVE_NAMES}
+    index = {"root": root_path, "dirs": {}, "hives": {}, "user_hives": [], "logs": {}}
+    dir_mtimes = {}
+    hive_dirs = set()
+
+    # Depth-first in the same top-down order as os.walk, so the first match wins as before
+    stack = [root_path]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = list(it)
+            dir_mtimes[current] = os.stat(current).st_mtime_ns
+        except OSError:
+            continue
+
+        subdirs = []
+        names = {}
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                    continue
+            except OSError:
+                continue
+            names[entry.name.lower()] = entry.name
+
+        found = []
+        for hive_name in SYSTEM_HIVE_NAMES:
+            if names.get(hive_name.lower()) == hive_name and hive_name not in index["hives"]:
+                hive_path = os.path.join(current, hive_name)
+                index["hives"][hive_name] = hive_path
+                found.append(hive_path)
+        for lower_name, hive_name in user_names.items():
+            if lower_name in names:
+                hive_path = os.path.join(current, names[lower_name])
+                index["user_hives"].append({"name": hive_name, "path": hive_path})
+                found.append(hive_path)
+
+        # Transaction logs sit next to their hive, keyed by the hive path
+        for hive_path in found:
+            base = os.path.basename(hive_path).lower()
+            logs = [os.path.join(current, names[base + suffix.lower()])
+                    for suffix in HIVE_LOG_SUFFIXES if base + suffix.lower() in names]
+            if logs:
+                index["logs"][hive_path] = logs
+        if found:
+            hive_dirs.add(current)
+        if os.path.basename(current).lower() in PROFILE_FOLDER_NAMES:
+            hive_dirs.add(current)
+            hive_dirs.update(subdirs)
+
+        stack.extend(reversed(subdirs))
+
+    # Only directories holding a hive, user profile folders and their ancestors are re-checked
+    # for freshness: a new profile or hive, or a re-extracted config folder, changes one of
+    # their mtimes, without a stat per directory of the whole image
+    watched = {root_path}
+    for hive_dir in hive_dirs:
+        while hive_dir not in watched:
+            watched.add(hive_dir)
+            hive_dir = os.path.dirname(hive_dir)
+    index["dirs"] = {dir_path: dir_mtimes[dir_path] for dir_path in watched if dir_path in dir_mtimes}
+    return index
+
+# The stored index is only valid while no directory it watches has changed
+def is_hive_index_fresh(index):
+    for dir_path, mtime_ns in index.get("dirs", {}).items():
+        try:
+            if os.stat(dir_path).st_mtime_ns != mtime_ns:
+                return False
+        except OSError:
+            return False
+    return bool(index.get("dirs"))
+
+def hive_index_path(root_path, index_dir=HIVE_INDEX_DIR):
+    name = hashlib.sha256(root_path.encode("utf-8", "surrogatepass")).hexdigest()[:32]
+    return os.path.join(index_dir, f"{name}.json")
+
+def evict_hive_indexes(index_dir=HIVE_INDEX_DIR, max_roots=HIVE_INDEX_MAX_ROOTS):
+    # The file mtime is the last time its root was used
+    try:
+        with os.scandir(index_dir) as it:
+            entries = [(entry.stat().st_mtime, entry.path) for entry in it if entry.name.endswith(".json")]
+    except OSError:
+        return
+    entries.sort(reverse=True)
+    for _, path in entries[max_roots:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def load_hive_index(folder_path, index_dir=HIVE_INDEX_DIR, max_roots=HIVE_INDEX_MAX_ROOTS):
+    root_path = os.path.abspath(folder_path)
+    index_file = hive_index_path(root_path, index_dir)
+    try:
+        with open(index_file, "r") as f:
+            index = json.load(f)
+        # A hash collision is treated as a miss
+        if index.get("root") == root_path and is_hive_index_fresh(index):
+            if time.time() - os.stat(index_file).st_mtime > HIVE_INDEX_TOUCH_SECONDS:
+                os.utime(index_file)
+            return index
+    except (OSError, ValueError):
+        pass
+
+    index = build_hive_index(root_path)
+
+    # One file per root, so parallel runs on different images never overwrite each other;
+    # a temp file first so concurrent runs never read a half-written index
+    try:
+        os.makedirs(index_dir, exist_ok=True)
+        tmp_file = f"{index_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_file, index_file)
+        evict_hive_indexes(index_dir, max_roots)
+    except OSError as e:
+        print(f"Could not save hive index: {e}")
+    return index
+
 # Function to find registry hive files
 def find_hive_files(folder_path, hive_name):
-    for root, dirs, files in os.walk(folder_path):
-        if hive_name in files:
-            return os.path.join(root, hive_name)
-    return None
+    return load_hive_index(folder_path)["hives"].get(hive_name)
 
-# Get the folder path from the command line argument
-folder_path = sys.argv[1]  # This will get the image path passed from the app.py
+# Extractors are visitors: each registers the key paths it reads, and every
+# hive is walked once for all of them (see hive_visitors.py)
 
-# Locate the SOFTWARE, SAM, SYSTEM, and SECURITY files
-software_hive_path = find_hive_files(folder_path, "SOFTWARE")
-sam_hive_path = find_hive_files(folder_path, "SAM")
-system_hive_path = find_hive_files(folder_path, "SYSTEM")
-security_hive_path = find_hive_files(folder_path, "SECURITY")
+def json_safe(data):
+    # REG_BINARY, REG_NONE and unknown types come back as bytes, which the report cannot hold
+    return data.hex() if isinstance(data, (bytes, bytearray)) else data
 
-# Initialize a dictionary to store all the forensic data
-forensic_data = {}
+def read_value(key, value_name):
+    return json_safe(key.value(value_name).value())
 
-# Extract OS information from the SOFTWARE hive
-if software_hive_path:
+def value_or(key, value_name, default):
     try:
-        software_hive = Registry.Registry(software_hive_path)
-        os_key_path = "Microsoft\\Windows NT\\CurrentVersion"
-        os_key = software_hive.open(os_key_path)
-
-        forensic_data["OS"] = {
-            "Name": os_key.value("ProductName").value(),
-            "Release ID": os_key.value("ReleaseId").value(),
-            "Current Build": os_key.value("CurrentBuild").value(),
-            "Version": os_key.value("DisplayVersion").value(),
+        return read_value(key, value_name)
+    except Registry.RegistryValueNotFoundException:
+        return default
+
+# OS information from the SOFTWARE hive
+@register_visitor
+class OperatingSystem(KeyVisitor):
+    hive = "SOFTWARE"
+    patterns = {"Microsoft\\Windows NT\\CurrentVersion": "visit_current_version"}
+
+    def __init__(self, control_set):
+        super().__init__(control_set)
+        self.os = None
+
+    def visit_current_version(self, path, key):
+        self.os = {
+            "Name": read_value(key, "ProductName"),
+            "Release ID": read_value(key, "ReleaseId"),
+            "Current Build": read_value(key, "CurrentBuild"),
+            "Version": read_value(key, "DisplayVersion"),
         }
-    except Exception as e:
-        print(f"An error occurred while processing SOFTWARE hive: {e}")
-else:
-    print("SOFTWARE hive not found in the specified folder.")
 
-# Extract user count and list user names from the SAM hive
-if sam_hive_path:
-    try:
-        sam_hive = Registry.Registry(sam_hive_path)
-        user_key_path = "SAM\\Domains\\Account\\Users\\Names"
-        user_key = sam_hive.open(user_key_path)
-        
-        # Extract user accounts and build the dictionary
-        users = [subkey.name() for subkey in user_key.subkeys()]
-        user_data = {"total users": len(users)}
-        
+    def result(self):
+        return {"OS": self.os} if self.os else {}
+
+# Programs started at logon from the machine-wide Run keys
+@register_visitor
+class RunKeys(KeyVisitor):
+    hive = "SOFTWARE"
+    patterns = {
+        "Microsoft\\Windows\\CurrentVersion\\Run": "visit_run_key",
+        "Microsoft\\Windows\\CurrentVersion\\RunOnce": "visit_run_key",
+        "WOW6432Node\\Microsoft\\Windows\\CurrentVersion\\Run": "visit_run_key",
+        "WOW6432Node\\Microsoft\\Windows\\CurrentVersion\\RunOnce": "visit_run_key",
+    }
+
+    def __init__(self, control_set):
+        super().__init__(control_set)
+        self.entries = {}
+
+    def visit_run_key(self, path, key):
+        for value in key.values():
+            self.entries[f"{path}\\{value.name()}"] = json_safe(value.value())
+
+    def result(self):
+        return {"Run Keys": self.entries} if self.entries else {}
+
+# User count and user names from the SAM hive
+@register_visitor
+class UserAccounts(KeyVisitor):
+    hive = "SAM"
+    patterns = {
+        "SAM\\Domains\\Account\\Users\\Names": "visit_names",
+        "SAM\\Domains\\Account\\Users\\Names\\*": "visit_user",
+    }
+
+    def __init__(self, control_set):
+        super().__init__(control_set)
+        self.found = False
+        self.users = []
+
+    def visit_names(self, path, key):
+        self.found = True
+
+    def visit_user(self, path, key):
+        self.users.append(key.name())
+
+    def result(self):
+        if not self.found:
+            return {"Users": {"Error": "User Accounts not found"}}
+
+        user_data = {"total users": len(self.users)}
         # Add user names to the forensic data, using a numbered pattern
-        for i, user in enumerate(users, start=1):
+        for i, user in enumerate(self.users, start=1):
             user_data[f"user {i:02}"] = user
-        
-        forensic_data["Users"] = user_data
-        
-    except Exception as e:
-        forensic_data["Users"] = {"Error": "User Accounts not found"}
-else:
-    print("SAM hive not found in the specified folder.")
-
-# Extract computer name, processor details, HDD/SSD details, shutdown time, and system model/manufacturer from the SYSTEM hive
-if system_hive_path:
-    try:
-        system_hive = Registry.Registry(system_hive_path)
+        return {"Users": user_data}
 
-        # Computer name
-        computer_name_key_path = "ControlSet001\\Control\\ComputerName\\ComputerName"
-        computer_name_key = system_hive.open(computer_name_key_path)
-        forensic_data["Computer"] = {
-            "Name": computer_name_key.value("ComputerName").value()
-        }
+# Computer name from the SYSTEM hive
+@register_visitor
+class ComputerName(KeyVisitor):
+    hive = "SYSTEM"
+    patterns = {"{ControlSet}\\Control\\ComputerName\\ComputerName": "visit_computer_name"}
 
-        # Processor details
-        processor_key_path = "ControlSet001\\Enum\\ACPI"
-        processor_key = system_hive.open(processor_key_path)
-        for subkey in processor_key.subkeys():
-            if "GenuineIntel" in subkey.name() or "AuthenticAMD" in subkey.name():
-                processor_name = subkey.name().split('-')[-2]
-                trimmed_name = subkey.name().split('-')[-1]  
-                forensic_data["Processor"] = {
-                    "Identifier": subkey.name().split('-')[1],
-                    "ProcessorName": processor_name,
-                    "ProcessorType": trimmed_name
-                }
-                break
-
-        # HDD/SSD details
-        scsi_key_path = "ControlSet001\\Enum\\SCSI"
-        hdd_details = {}
-        try:
-            scsi_key = system_hive.open(scsi_key_path)
-            for index, subkey in enumerate(scsi_key.subkeys()):
-                for device_key in subkey.subkeys():
-                    try:
-                        device_name = device_key.value("FriendlyName").value()
-                        hdd_details[str(index)] = device_name.split(';')[-1]
-                    except Exception:
-                        pass
-            forensic_data["Storage"] = hdd_details
-        except Exception:
-            forensic_data["Storage"] = "Details not found"
-
-        # Shutdown time
-        shutdown_time_key_path = "ControlSet001\\Control\\Windows"
-        shutdown_time_key = system_hive.open(shutdown_time_key_path)
-        shutdown_time = shutdown_time_key.value("ShutdownTime").value()
-        readable_shutdown_time = filetime_to_datetime(int.from_bytes(shutdown_time, "little"))
-        forensic_data["Shutdown"] = {"Last Shutdown Time": str(readable_shutdown_time)}
-
-        # Motherboard details
-        try:
-            motherboard_key_path_1 = "ControlSet001\\Enum\\Root\\ACPI_HAL\\0000"
-            motherboard_key = system_hive.open(motherboard_key_path_1)
-            motherboard_name = motherboard_key.value("DeviceDesc").value().split(';')[-1]
-            forensic_data["Motherboard"] = {"Details": motherboard_name}
-        except Exception:
-            try:
-                motherboard_key_path_2 = "ControlSet001\\Enum\\ACPI_HAL"
-                motherboard_key = system_hive.open(motherboard_key_path_2)
-                motherboard_name = motherboard_key.value("DeviceDesc").value().split(';')[-1]
-                forensic_data["Motherboard"] = {"Details": motherboard_name}
-            except Exception:
-                forensic_data["Motherboard"] = {"Details": "Motherboard details not found"}
-
-        # System model and manufacturer
-        try:
-            hardware_config_key = system_hive.open("HardwareConfig")
-            first_uuid_key = hardware_config_key.subkeys()[0]
-            system_model_key_path = f"HardwareConfig\\{first_uuid_key.name()}"
-            system_model_key = system_hive.open(system_model_key_path)
-
-            def get_value_safe(key, value_name):
-                try:
-                    return key.value(value_name).value()
-                except Registry.RegistryValueNotFoundException:
-                    return "Not Found"
-
-            system_model = get_value_safe(system_model_key, "SystemProductName")
-            manufacturer = get_value_safe(system_model_key, "SystemManufacturer")
-            SystemSKU = get_value_safe(system_model_key, "SystemSKU")
-            SystemVersion = get_value_safe(system_model_key, "SystemVersion")
-            BIOSVendor = get_value_safe(system_model_key, "BIOSVendor")
-            BIOSVersion = get_value_safe(system_model_key, "BIOSVersion")
-            BIOSReleaseDate = get_value_safe(system_model_key, "BIOSReleaseDate")
-
-            forensic_data["System"] = {
-                "Model": system_model,
-                "Manufacturer": manufacturer,
-                "SystemSKU": SystemSKU,
-                "SystemVersion": SystemVersion
+    def __init__(self, control_set):
+        super().__init__(control_set)
+        self.name = None
+
+    def visit_computer_name(self, path, key):
+        self.name = read_value(key, "ComputerName")
+
+    def result(self):
+        return {"Computer": {"Name": self.name}} if self.name is not None else {}
+
+# Processor details, from the first Intel or AMD entry under Enum\ACPI
+@register_visitor
+class Processor(KeyVisitor):
+    hive = "SYSTEM"
+    patterns = {"{ControlSet}\\Enum\\ACPI\\*": "visit_acpi_device"}
+
+    def __init__(self, control_set):
+        super().__init__(control_set)
+        self.processor = None
+
+    def visit_acpi_device(self, path, key):
+        name = key.name()
+        if self.processor is None and ("GenuineIntel" in name or "AuthenticAMD" in name):
+            self.processor = {
+                "Identifier": name.split('-')[1],
+                "ProcessorName": name.split('-')[-2],
+                "ProcessorType": name.split('-')[-1],
             }
-            forensic_data["BIOS Info"] = {
-                "BIOSVendor": BIOSVendor,
-                "BIOSVersion": BIOSVersion,
-                "BIOSReleaseDate": BIOSReleaseDate
+
+    def result(self):
+        return {"Processor": self.processor} if self.processor else {}
+
+# HDD/SSD details; devices are numbered by their vendor key's position under Enum\SCSI
+@register_visitor
+class Storage(KeyVisitor):
+    hive = "SYSTEM"
+    patterns = {
+        "{ControlSet}\\Enum\\SCSI": "visit_scsi",
+        "{ControlSet}\\Enum\\SCSI\\*": "visit_vendor",
+        "{ControlSet}\\Enum\\SCSI\\*\\*": "visit_device",
+    }
+
+    def __init__(self, control_set):
+        super().__init__(control_set)
+        self.found = False
+        self.index = -1
+        self.hdd_details = {}
+
+    def visit_scsi(self, path, key):
+        self.found = True
+
+    def visit_vendor(self, path, key):
+        self.index += 1
+
+    def visit_device(self, path, key):
+        device_name = value_or(key, "FriendlyName", None)
+        if isinstance(device_name, str):
+            self.hdd_details[str(self.index)] = device_name.split(';')[-1]
+
+    def result(self):
+        return {"Storage": self.hdd_details if self.found else "Details not found"}
+
+# Last shutdown time
+@register_visitor
+class Shutdown(KeyVisitor):
+    hive = "SYSTEM"
+    patterns = {"{ControlSet}\\Control\\Windows": "visit_windows"}
+
+    def __init__(self, control_set):
+        super().__init__(control_set)
+        self.shutdown_time = None
+
+    def visit_windows(self, path, key):
+        shutdown_time = key.value("ShutdownTime").value()
+        self.shutdown_time = str(filetime_to_datetime(int.from_bytes(shutdown_time, "little")))
+
+    def result(self):
+        return {"Shutdown": {"Last Shutdown Time": self.shutdown_time}} if self.shutdown_time else {}
+
+# Motherboard details, from the ACPI HAL device
+@register_visitor
+class Motherboard(KeyVisitor):
+    hive = "SYSTEM"
+    patterns = {
+        "{ControlSet}\\Enum\\Root\\ACPI_HAL\\0000": "visit_hal_device",
+        "{ControlSet}\\Enum\\ACPI_HAL": "visit_hal_fallback",
+    }
+
+    def __init__(self, control_set):
+        super().__init__(control_set)
+        self.details = None
+        self.fallback = None
+
+    def visit_hal_device(self, path, key):
+        description = value_or(key, "DeviceDesc", None)
+        if isinstance(description, str):
+            self.details = description.split(';')[-1]
+
+    def visit_hal_fallback(self, path, key):
+        description = value_or(key, "DeviceDesc", None)
+        if isinstance(description, str):
+            self.fallback = description.split(';')[-1]
+
+    def result(self):
+        return {"Motherboard": {"Details": self.details or self.fallback or "Motherboard details not found"}}
+
+# System model, manufacturer and BIOS, from the first HardwareConfig entry
+@register_visitor
+class HardwareConfig(KeyVisitor):
+    hive = "SYSTEM"
+    patterns = {"HardwareConfig\\*": "visit_config"}
+
+    def __init__(self, control_set):
+        super().__init__(control_set)
+        self.config = None
+
+    def visit_config(self, path, key):
+        if self.config is not None:
+            return
+        self.config = {name: value_or(key, name, "Not Found") for name in (
+            "SystemProductName", "SystemManufacturer", "SystemSKU", "SystemVersion",
+            "BIOSVendor", "BIOSVersion", "BIOSReleaseDate")}
+
+    def result(self):
+        if self.config is None:
+            return {
+                "System": {"Model": "Key not found", "Manufacturer": "Key not found", "SystemSKU": "Key not found",
+                           "SystemVersion": "Key not found"},
+                "BIOS Info": {"BIOSVendor": "Key not found", "BIOSVersion": "Key not found",
+                              "BIOSReleaseDate": "Key not found"},
             }
+        config = self.config
+        return {
+            "System": {
+                "Model": config["SystemProductName"],
+                "Manufacturer": config["SystemManufacturer"],
+                "SystemSKU": config["SystemSKU"],
+                "SystemVersion": config["SystemVersion"],
+            },
+            "BIOS Info": {
+                "BIOSVendor": config["BIOSVendor"],
+                "BIOSVersion": config["BIOSVersion"],
+                "BIOSReleaseDate": config["BIOSReleaseDate"],
+            },
+        }
+
+# USB mass-storage devices ever connected, by instance (serial) under Enum\USBSTOR
+@register_visitor
+class UsbStorage(KeyVisitor):
+    hive = "SYSTEM"
+    patterns = {"{ControlSet}\\Enum\\USBSTOR\\*\\*": "visit_device"}
+
+    def __init__(self, control_set):
+        super().__init__(control_set)
+        self.devices = {}
+
+    def visit_device(self, path, key):
+        device_class = path.split("\\")[-2]
+        self.devices[key.name()] = value_or(key, "FriendlyName", device_class)
+
+    def result(self):
+        return {"USB Storage": self.devices} if self.devices else {}
+
+# Services set to start automatically (Start = 2), with their image paths
+@register_visitor
+class AutoStartServices(KeyVisitor):
+    hive = "SYSTEM"
+    patterns = {"{ControlSet}\\Services\\*": "visit_service"}
 
-        except Registry.RegistryKeyNotFoundException:
-            forensic_data["System"] = {"Model": "Key not found", "Manufacturer": "Key not found", "SystemSKU": "Key not found", "SystemVersion": "Key not found"}
-            forensic_data["BIOS Info"] = {"BIOSVendor": "Key not found", "BIOSVersion": "Key not found", "BIOSReleaseDate": "Key not found"}
+    def __init__(self, control_set):
+        super().__init__(control_set)
+        self.services = {}
 
-    except Exception as e:
-        print(f"An error occurred while processing SYSTEM hive: {e}")
-else:
-    print("SYSTEM hive not found in the specified folder.")
+    def visit_service(self, path, key):
+        if value_or(key, "Start", None) == 2:
+            self.services[key.name()] = value_or(key, "ImagePath", "")
 
-# Extract security policies from the SECURITY hive
-if security_hive_path:
+    def result(self):
+        return {"Auto-start Services": self.services} if self.services else {}
+
+# Security policies from the SECURITY hive
+@register_visitor
+class SecurityPolicies(KeyVisitor):
+    hive = "SECURITY"
+    # Report label for each policy key
+    policies = {
+        "Audit Policies": "Policy\\PolAdtEv",
+        "Access Control Policies": "Policy\\PolAcDmS",
+        "User Rights Assignment": "Policy\\PolPrDmS",
+    }
+    patterns = {path: "visit_policy" for path in policies.values()}
+
+    def __init__(self, control_set):
+        super().__init__(control_set)
+        self.present = set()
+
+    def visit_policy(self, path, key):
+        self.present.add(path.lower())
+
+    def result(self):
+        return {description: {"Status": "Present" if path.lower() in self.present else "Not Found"}
+                for description, path in self.policies.items()}
+
+def extract_software(hive_path, errors=None):
+    return extract_hive("SOFTWARE", hive_path, errors=errors)
+
+def extract_sam(hive_path, errors=None):
+    return extract_hive("SAM", hive_path, errors=errors)
+
+def extract_system(hive_path, errors=None):
+    return extract_hive("SYSTEM", hive_path, errors=errors)
+
+def extract_security(hive_path, errors=None):
+    return extract_hive("SECURITY", hive_path, errors=errors)
+
+# Hive extractors in the order their keys appear in the report
+HIVE_EXTRACTORS = (
+    ("SOFTWARE", extract_software),
+    ("SAM", extract_sam),
+    ("SYSTEM", extract_system),
+    ("SECURITY", extract_security),
+)
+
+# Bump when an extractor's output changes so stale cache entries are ignored
+EXTRACTOR_VERSION = 2
+
+# Run one extractor and report how long it took and what failed, so pool workers can hand both back
+def timed_extract(extractor, hive_path):
+    start = time.perf_counter()
+    errors = {}
+    partial = extractor(hive_path, errors)
+    return partial, time.perf_counter() - start, errors
+
+# Analyze an image folder and return the forensic data as a dictionary
+def analyze_image(folder_path, jobs=1, use_cache=True, hash_mode="sampled"):
+    # Locate the SOFTWARE, SAM, SYSTEM, and SECURITY files with a single walk
+    with span("hive_index"):
+        hive_paths = load_hive_index(folder_path)["hives"]
+
+    found = []
+    for hive_name, extractor in HIVE_EXTRACTORS:
+        hive_path = hive_paths.get(hive_name)
+        if hive_path:
+            found.append((hive_name, extractor, hive_path))
+        else:
+            print(f"{hive_name} hive not found in the specified folder.")
+
+    # A cache hit skips Registry parsing for that hive
+    cache = HiveResultCache() if use_cache else None
+    partials = [None] * len(found)
+    cache_keys = [None] * len(found)
     try:
-        security_hive = Registry.Registry(security_hive_path)
-        
-        # Define paths and keys for security policies
-        paths_and_keys = {
-            "Audit Policies": "Policy\\PolAdtEv",
-            "Access Control Policies": "Policy\\PolAcDmS",
-            "User Rights Assignment": "Policy\\PolPrDmS"
-        }
+        if cache:
+            with span("hive_cache"):
+                for i, (_, extractor, hive_path) in enumerate(found):
+                    try:
+                        cache_keys[i] = f"{extractor.__name__}:{EXTRACTOR_VERSION}:{fingerprint_hive(hive_path, hash_mode)}"
+                        partials[i] = cache.get(cache_keys[i])
+                    except OSError as e:
+                        print(f"Could not fingerprint {hive_path}: {e}")
+        pending = [i for i, partial in enumerate(partials) if partial is None]
 
-        # Check for the presence of the security policies
-        for description, path in paths_and_keys.items():
-            try:
-                security_key = security_hive.open(path)
-                forensic_data[description] = {"Status": "Present"}
-            except Exception:
-                forensic_data[description] = {"Status": "Not Found"}
-                
-    except Exception as e:
-        print(f"An error occurred while processing SECURITY hive: {e}")
-else:
-    print("SECURITY hive not found in the specified folder.")
-
-# Write to a JSON file for frontend access
-with open("forensics1.json", "w") as json_file:
-    json.dump(forensic_data, json_file, indent=4)
+        # The hives share no state, so each one can be parsed in its own process
+        if jobs > 1 and len(pending) > 1:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(pending))) as pool:
+                futures = {i: pool.submit(timed_extract, found[i][1], found[i][2]) for i in pending}
+                results = {i: future.result() for i, future in futures.items()}
+        else:
+            results = {i: timed_extract(found[i][1], found[i][2]) for i in pending}
+        for i, (partial, seconds, errors) in results.items():
+            partials[i] = partial
+            record(f"parse_{found[i][0]}", seconds, HIVE_PARSE_SECONDS, hive=found[i][0])
+
+            # A failed or partial read may succeed next time, so only clean results are kept
+            if cache and cache_keys[i] and is_clean_run(errors):
+                cache.put(cache_keys[i], partial)
+    finally:
+        if cache:
+            cache.close()
+
+    # Initialize a dictionary to store all the forensic data, merged in hive order
+    forensic_data = {}
+    for partial in partials:
+        forensic_data.update(partial)
+    return forensic_data
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract forensic data from exported registry hives.")
+    parser.add_argument("folder_path", help="Folder containing the SOFTWARE, SAM, SYSTEM and SECURITY hives")
+    parser.add_argument("--jobs", type=int, default=1, help="Parse hives in N worker processes (1 = serial)")
+    parser.add_argument("--no-cache", action="store_true", help="Always parse hives, ignoring cached results")
+    parser.add_argument("--hash", choices=HASH_MODES, default="sampled",
+                        help="Fingerprint hives with a sampled or full SHA-256 for the result cache")
+    args = parser.parse_args()
+
+    forensic_data = analyze_image(args.folder_path, jobs=args.jobs, use_cache=not args.no_cache, hash_mode=args.hash)
+
+    # Write to a JSON file for frontend access
+    with open("forensics1.json", "w") as json_file:
+        json.dump(forensic_data, json_file, indent=4)
+
+    # Keep every run, keyed by image, so later runs can be diffed against it
+    record_snapshot("forensics", forensic_data, host=os.path.abspath(args.folder_path))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+Columnar in-memory table of scanned browser history.
+
+Rows live in parallel arrays instead of one dict per row: URLs and titles are
+UTF-8 packed into one buffer each with an offset array, visit times stay raw
+epoch integers until an entry is serialized, hostnames are interned once and
+referenced by id, and malicious rows are kept as row indices with an interned
+reason. Verdicts are cached per (hostname, plain HTTP), so each distinct host
+goes through the domain indexes once.
+
+Filters return arrays of row indices, so they compose without copying rows, and
+aggregations work on the integer columns. to_result() builds the usual report
+shape only when it is asked for.
+
+    python history_table.py --top 10 --hours
+    python history_table.py --history path/to/History --json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from array import array
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
+from browser_scan import host_reason, open_history, brave_history_path, BATCH_SIZE
+from metrics import span, ROWS_SCANNED
+
+# Visit times are microseconds since these (naive UTC, as in browser_scan)
+CHROME_EPOCH = datetime(1601, 1, 1)
+FIREFOX_EPOCH = datetime(1970, 1, 1)
+
+# Microseconds per hour; both epochs start on an hour boundary
+HOUR = 3600 * 1000000
+
+# Raw history rows for each browser family, newest first when limited
+HISTORY_QUERIES = {
+    "chromium": ("urls", CHROME_EPOCH,
+                 "SELECT url, title, last_visit_time FROM urls",
+                 "SELECT url, title, last_visit_time FROM urls ORDER BY last_visit_time DESC LIMIT ?"),
+    "firefox": ("moz_places", FIREFOX_EPOCH,
+                "SELECT url, title, last_visit_date FROM moz_places",
+                "SELECT url, title, last_visit_date FROM moz_places ORDER BY last_visit_date DESC LIMIT ?"),
+}
+
+
+class StringColumn:
+    """Strings packed into one UTF-8 buffer; None is kept apart from the empty string."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array("Q", [0])
+        self.nulls = set()
+
+    def append(self, value):
+        if value is None:
+            self.nulls.add(len(self.offsets) - 1)
+        else:
+            self.data += value.encode("utf-8", "surrogatepass")
+        self.offsets.append(len(self.data))
+
+    def __getitem__(self, i):
+        if i in self.nulls:
+            return None
+        return self.data[self.offsets[i]:self.offsets[i + 1]].decode("utf-8", "surrogatepass")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def nbytes(self):
+        return len(self.data) + self.offsets.itemsize * len(self.offsets)
+
+
+class HistoryTable:
+    """Scanned history rows in parallel columns, with interned hosts and malicious row indices."""
+
+    def __init__(self, browser="Brave", epoch=CHROME_EPOCH):
+        self.browser = browser
+        self.epoch = epoch
+        self.urls = StringColumn()
+        self.titles = StringColumn()
+        self.times = array("q")
+        self.domain_ids = array("I")
+        self.domains = []
+        self.hits = array("I")
+        self.hit_reasons = array("I")
+        self.reasons = []
+        self._domain_lookup = {}
+        self._reason_lookup = {}
+        self._verdicts = {}
+
+    def append(self, url, title, visit_time):
+        try:
+            parsed = urlsplit(url)
+            # The verdict only depends on the hostname and on whether the scheme is plain HTTP
+            key = (parsed.hostname or "", parsed.scheme == "http")
+        except Exception:
+            # Unparseable URLs get no verdict, as with is_malicious
+            key = None
+
+        domain = key[0] if key else ""
+        domain_id = self._domain_lookup.get(domain)
+        if domain_id is None:
+            domain_id = self._domain_lookup[domain] = len(self.domains)
+            self.domains.append(domain)
+
+        if key is None:
+            reason_id = None
+        elif key in self._verdicts:
+            reason_id = self._verdicts[key]
+        else:
+            try:
+                reason = host_reason(domain, "http" if key[1] else "")
+            except Exception:
+                reason = None
+            reason_id = self._verdicts[key] = self._reason_id(reason)
+
+        row = len(self.times)
+        if reason_id is not None:
+            self.hits.append(row)
+            self.hit_reasons.append(reason_id)
+        self.urls.append(url)
+        self.titles.append(title)
+        self.times.append(visit_time or 0)
+        self.domain_ids.append(domain_id)
+
+    def _reason_id(self, reason):
+        if reason is None:
+            return None
+        reason_id = self._reason_lookup.get(reason)
+        if reason_id is None:
+            reason_id = self._reason_lookup[reason] = len(self.reasons)
+            self.reasons.append(reason)
+        return reason_id
+
+    def __len__(self):
+        return len(self.times)
+
+    def nbytes(self):
+        """Approximate size of the columns, without the interned strings."""
+        arrays = (self.times, self.domain_ids, self.hits, self.hit_reasons)
+        return self.urls.nbytes() + self.titles.nbytes() + sum(a.itemsize * len(a) for a in arrays)
+
+    # Row access
+
+    def to_datetime(self, raw_time):
+        if raw_time:
+            return self.epoch + timedelta(microseconds=raw_time)
+        return None
+
+    def to_raw_time(self, dt):
+        if dt.tzinfo is not None:
+            dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+        return (dt - self.epoch) // timedelta(microseconds=1)
+
+    def visit_time(self, row):
+        return self.to_datetime(self.times[row])
+
+    def domain(self, row):
+        return self.domains[self.domain_ids[row]]
+
+    def reasons_by_row(self):
+        return {row: self.reasons[reason_id] for row, reason_id in zip(self.hits, self.hit_reasons)}
+
+    def entry(self, row):
+        visit_time = self.to_datetime(self.times[row])
+        return {"url": self.urls[row], "title": self.titles[row],
+                "last_visit": visit_time.isoformat() if visit_time else None}
+
+    # Filters and ordering; rows=None means every row
+
+    def all_rows(self):
+        return array("I", range(len(self.times)))
+
+    def filter(self, rows=None, domain=None, start=None, end=None, malicious=None):
+        """Row indices matching every given condition, in the order of rows.
+
+        domain also matches its subdomains; start and end are datetimes bounding
+        the visit time as [start, end); malicious=True keeps flagged rows only.
+        """
+        if rows is None and malicious:
+            rows = array("I", self.hits)
+        else:
+            rows = self.all_rows() if rows is None else rows
+            if malicious is not None:
+                flagged = set(self.hits)
+                rows = array("I", (row for row in rows if (row in flagged) == malicious))
+
+        if domain is not None:
+            domain = domain.lower()
+            wanted = {domain_id for domain_id, name in enumerate(self.domains)
+                      if name == domain or name.endswith("." + domain)}
+            domain_ids = self.domain_ids
+            rows = array("I", (row for row in rows if domain_ids[row] in wanted))
+
+        if start is not None or end is not None:
+            low = self.to_raw_time(start) if start is not None else None
+            high = self.to_raw_time(end) if end is not None else None
+            times = self.times
+            rows = array("I", (row for row in rows
+                               if (low is None or times[row] >= low) and (high is None or times[row] < high)))
+        return rows
+
+    def sort(self, rows=None, by="time", descending=True):
+        """Row indices ordered by "time", "domain" or "url"."""
+        rows = self.all_rows() if rows is None else rows
+        if by == "time":
+            key = self.times.__getitem__
+        elif by == "domain":
+            domains, domain_ids = self.domains, self.domain_ids
+            key = lambda row: domains[domain_ids[row]]  # noqa: E731
+        elif by == "url":
+            key = self.urls.__getitem__
+        else:
+            raise ValueError(f"Unknown sort key: {by}")
+        return array("I", sorted(rows, key=key, reverse=descending))
+
+    # Aggregations
+
+    def top_domains(self, n=10, rows=None):
+        """The n most visited hosts as (host, rows) pairs."""
+        if rows is None:
+            counts = Counter(self.domain_ids)
+        else:
+            domain_ids = self.domain_ids
+            counts = Counter(domain_ids[row] for row in rows)
+        return [(self.domains[domain_id], count) for domain_id, count in counts.most_common(n)]
+
+    def visits_per_hour(self, rows=None):
+        """Rows per hour of last visit, oldest hour first, as {ISO hour: count}; rows without a time are skipped."""
+        times = self.times if rows is None else (self.times[row] for row in rows)
+        counts = Counter(visit_time // HOUR for visit_time in times if visit_time)
+        return {(self.epoch + timedelta(hours=hour)).isoformat(): count for hour, count in sorted(counts.items())}
+
+    # Serialization
+
+    def iter_entries(self, rows=None):
+        for row in (range(len(self.times)) if rows is None else rows):
+            yield self.entry(row)
+
+    def hit_rows(self, rows=None):
+        if rows is None:
+            return self.hits
+        wanted = set(rows)
+        return [row for row in self.hits if row in wanted]
+
+    def to_result(self, rows=None):
+        """The report shape build_scan_result returns, for all rows or the given ones."""
+        hits = self.hit_rows(rows)
+        reasons = self.reasons_by_row()
+
+        history = list(self.iter_entries(rows))
+        result = {
+            "browser": self.browser,
+            "history_checked": len(history),
+            "history": history,
+        }
+        if hits:
+            result["malicious_sites"] = [{**self.entry(row), "reason": reasons[row]} for row in hits]
+        else:
+            result["message"] = "You didn't visit any malicious website!"
+        return result
+
+    def write_json(self, out, rows=None):
+        """Write the to_result() report to out as compact JSON, building one entry at a time; returns the entry count."""
+        separators = (",", ":")
+        count = len(self) if rows is None else len(rows)
+        out.write('{"browser":' + json.dumps(self.browser) + f',"history_checked":{count},"history":[')
+        for index, entry in enumerate(self.iter_entries(rows)):
+            out.write(("," if index else "") + json.dumps(entry, separators=separators))
+        out.write("],")
+
+        hits = self.hit_rows(rows)
+        if hits:
+            reasons = self.reasons_by_row()
+            out.write('"malicious_sites":[')
+            out.write(",".join(json.dumps({**self.entry(row), "reason": reasons[row]}, separators=separators)
+                               for row in hits))
+            out.write("]}")
+        else:
+            out.write('"message":' + json.dumps("You didn't visit any malicious website!") + "}")
+        return count
+
+
+def load_history_table(history_path=None, limit=None, family="chromium", browser="Brave", immutable=False,
+                       batch_size=BATCH_SIZE):
+    """Scan a History (or places.sqlite) database into a HistoryTable; Brave's Default profile by default."""
+    history_path = history_path or brave_history_path()
+    table_name, epoch, all_query, limited_query = HISTORY_QUERIES[family]
+    table = HistoryTable(browser, epoch)
+
+    with open_history(history_path, immutable, table=table_name) as conn:
+        cursor = conn.execute(all_query) if limit is None else conn.execute(limited_query, (limit,))
+        with span("history_table"):
+            append = table.append
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for url, title, visit_time in rows:
+                    append(url, title, visit_time)
+                ROWS_SCANNED.inc(len(rows))
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", help="Path to a History database (defaults to Brave's Default profile)")
+    parser.add_argument("--family", choices=sorted(HISTORY_QUERIES), default="chromium")
+    parser.add_argument("--limit", type=int, help="Only the newest rows")
+    parser.add_argument("--immutable", action="store_true",
+                        help="Open the database as immutable; only for copies no browser is writing")
+    parser.add_argument("--domain", help="Only rows for this host and its subdomains")
+    parser.add_argument("--top", type=int, default=10, help="Most visited hosts to list")
+    parser.add_argument("--hours", action="store_true", help="Also list visits per hour")
+    parser.add_argument("--json", action="store_true", help="Print the full report in the scan JSON shape")
+    args = parser.parse_args()
+
+    history_path = args.history or brave_history_path()
+    if not os.path.exists(history_path):
+        print(json.dumps({"error": "History not found"}))
+        sys.exit(1)
+
+    start = time.perf_counter()
+    table = load_history_table(history_path, args.limit, args.family, immutable=args.immutable)
+    elapsed = time.perf_counter() - start
+    rows = table.filter(domain=args.domain) if args.domain else None
+
+    if args.json:
+        print(json.dumps(table.to_result(rows)))
+        return
+
+    output = {
+        "rows": len(table) if rows is None else len(rows),
+        "malicious": len(table.hits) if rows is None else len(table.filter(rows, malicious=True)),
+        "distinct_hosts": len(table.domains),
+        "column_bytes": table.nbytes(),
+        "load_seconds": round(elapsed, 4),
+        "top_domains": table.top_domains(args.top, rows),
+    }
+    if args.hours:
+        output["visits_per_hour"] = table.visits_per_hour(rows)
+    print(json.dumps(output, indent=4))
+
+
+if __name__ == "__main__":
+    main()
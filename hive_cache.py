@@ -0,0 +1,122 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+from metrics import CACHE_REQUESTS
+
+# On-disk cache of per-hive extraction results, keyed by a fingerprint of the hive file
+CACHE_FILE = "hive_cache.db"
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Sampled fingerprints hash the header plus evenly spaced chunks of the file
+SAMPLE_SIZE = 64 * 1024
+SAMPLE_COUNT = 16
+HASH_MODES = ("sampled", "full")
+
+# Function to fingerprint a hive by size, mtime and a sampled or full SHA-256
+def fingerprint_hive(path, mode="sampled"):
+    if mode not in HASH_MODES:
+        raise ValueError(f"Unknown hash mode: {mode}")
+
+    stat = os.stat(path)
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        if mode == "full" or stat.st_size <= SAMPLE_SIZE * SAMPLE_COUNT:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        else:
+            # The first sample covers the REGF header with its sequence numbers
+            step = (stat.st_size - SAMPLE_SIZE) // (SAMPLE_COUNT - 1)
+            for i in range(SAMPLE_COUNT):
+                f.seek(i * step)
+                digest.update(f.read(SAMPLE_SIZE))
+
+    return f"{mode}:{stat.st_size}:{stat.st_mtime_ns}:{digest.hexdigest()}"
+
+
+class HiveResultCache:
+    """Size-bounded LRU cache of JSON results stored in a local SQLite file."""
+
+    def __init__(self, path=CACHE_FILE, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, count INTEGER NOT NULL)")
+        self.conn.commit()
+
+    def _count(self, name, amount=1):
+        self.conn.execute(
+            "INSERT INTO counters (name, count) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET count = count + excluded.count",
+            (name, amount)
+        )
+
+    def get(self, key):
+        with self.conn:
+            row = self.conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count("misses")
+                CACHE_REQUESTS.inc(cache="hive", result="miss")
+                return None
+            self.conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._count("hits")
+        CACHE_REQUESTS.inc(cache="hive", result="hit")
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        data = json.dumps(value)
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time())
+            )
+            self._evict()
+
+    def _evict(self):
+        # Drop least recently used entries until the cache fits its size bound
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self.conn.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        self._count("evictions", evicted)
+
+    def stats(self):
+        counters = dict(self.conn.execute("SELECT name, count FROM counters").fetchall())
+        entries, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "evictions": counters.get("evictions", 0),
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM entries")
+            self.conn.execute("DELETE FROM counters")
+
+    def close(self):
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    cache = HiveResultCache(sys.argv[2] if len(sys.argv) > 2 else CACHE_FILE)
+    if len(sys.argv) > 1 and sys.argv[1] == "clear":
+        cache.clear()
+    print(json.dumps(cache.stats(), indent=4))
@@ -0,0 +1,379 @@
+"""
+Recover deleted keys and values from the unallocated cells of a registry hive.
+
+The hive is memory-mapped and its HBINs are walked cell by cell through an
+int32 view of the map. Inside every free cell, bytes.find locates "nk" and "vk"
+signatures at cell-aligned positions, and each candidate is validated field by
+field before it is reported. Deleted keys get their path rebuilt by following
+parent offsets through live and deleted key cells; a chain that breaks is
+reported with path_complete False. Values still reachable from a deleted key's
+value list are listed with it.
+
+HBINs are split into byte ranges that worker processes carve independently;
+records are streamed range by range in file order.
+
+    python hive_carver.py path/to/SOFTWARE -o deleted.ndjson
+    python hive_carver.py path/to/NTUSER.DAT --workers 4 --keys-only
+"""
+
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import argparse
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+from hive_reader import MAX_KEY_DEPTH
+from registry_timeline import datetime_to_filetime, format_filetime
+
+# Offset of the first HBIN; cell offsets inside the hive are relative to it
+HBIN_BASE = 0x1000
+HBIN_ALIGNMENT = 0x1000
+
+NK_HEADER_SIZE = 0x4C
+VK_HEADER_SIZE = 0x14
+
+NK_FLAG_ROOT = 0x0004
+NK_FLAG_ASCII_NAME = 0x0020
+VK_FLAG_ASCII_NAME = 0x0001
+
+NO_OFFSET = 0xFFFFFFFF
+
+# REG_NONE .. REG_QWORD
+MAX_VALUE_TYPE = 11
+MAX_KEY_NAME_BYTES = 512
+MAX_VALUE_COUNT = 1 << 20
+MAX_SUBKEY_COUNT = 1 << 24
+
+# Value data larger than this is reported by size only
+MAX_DATA_BYTES = 4096
+
+# Deleted keys written outside this window are treated as noise
+MIN_FILETIME = datetime_to_filetime(datetime(1990, 1, 1, tzinfo=timezone.utc))
+MAX_FILETIME = datetime_to_filetime(datetime(2100, 1, 1, tzinfo=timezone.utc))
+
+# Ranges per worker, so slow ranges even out and records start streaming early
+RANGES_PER_WORKER = 4
+
+CARVE_WORKERS = int(os.environ.get("CARVE_WORKERS", str(os.cpu_count() or 1)))
+
+
+def map_hive(path):
+    with open(path, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # Every byte is read once, front to back
+    if hasattr(buf, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+        buf.madvise(mmap.MADV_SEQUENTIAL)
+    return buf
+
+
+def hbins_end(buf):
+    """End of the HBIN area: the header's data size, bounded by the file."""
+    if len(buf) < HBIN_BASE or buf[:4] != b"regf":
+        raise ValueError("Not a registry hive")
+    (data_size,) = struct.unpack_from("<I", buf, 0x28)
+    return min(HBIN_BASE + data_size, len(buf) - len(buf) % 4)
+
+
+def list_hbins(buf):
+    """Return (offset, size) of every HBIN; damaged ones are skipped by resyncing on 4 KiB boundaries."""
+    end = hbins_end(buf)
+    hbins = []
+    pos = HBIN_BASE
+    while pos + 0x20 <= end:
+        if buf[pos:pos + 4] == b"hbin":
+            (size,) = struct.unpack_from("<I", buf, pos + 8)
+            if size >= HBIN_ALIGNMENT and size % HBIN_ALIGNMENT == 0 and pos + size <= end:
+                hbins.append((pos, size))
+                pos += size
+                continue
+        pos += HBIN_ALIGNMENT
+    return hbins
+
+
+def split_ranges(hbins, count):
+    """Group consecutive HBINs into about count ranges of similar byte size."""
+    if not hbins:
+        return []
+    total = sum(size for _, size in hbins)
+    target = max(1, total // max(1, count))
+    ranges = []
+    current = []
+    current_size = 0
+    for hbin in hbins:
+        current.append(hbin)
+        current_size += hbin[1]
+        if current_size >= target:
+            ranges.append(current)
+            current = []
+            current_size = 0
+    if current:
+        ranges.append(current)
+    return ranges
+
+
+def free_cells(buf, hbin_offset, hbin_size):
+    """Yield (start, end) of the unallocated cells' data in one HBIN."""
+    cells = memoryview(buf)[hbin_offset:hbin_offset + hbin_size].cast("i")
+    i = 0x20 // 4
+    count = len(cells)
+    try:
+        while i < count:
+            size = cells[i]
+            # Allocated cells (negative sizes) are the common case and are only skipped
+            if size < 0:
+                i -= size >> 2
+            elif size > 0:
+                # A free size that is not a multiple of 8 or runs past the HBIN means the rest is damaged
+                if size & 7 or i + (size >> 2) > count:
+                    break
+                yield hbin_offset + i * 4 + 4, hbin_offset + (i + (size >> 2)) * 4
+                i += size >> 2
+            else:
+                break
+    finally:
+        cells.release()
+
+
+def decode_name(raw, ascii_name):
+    try:
+        name = raw.decode("latin-1") if ascii_name else raw.decode("utf-16le")
+    except UnicodeDecodeError:
+        return None
+    if not name or not name.isprintable():
+        return None
+    return name
+
+
+def parse_nk(buf, pos, end, data_end):
+    """Validate a candidate key record at pos (its "nk" signature) inside [pos, end); None if implausible."""
+    if pos + NK_HEADER_SIZE > end:
+        return None
+    flags, timestamp = struct.unpack_from("<HQ", buf, pos + 2)
+    parent, subkey_count = struct.unpack_from("<II", buf, pos + 0x10)
+    value_count, value_list = struct.unpack_from("<II", buf, pos + 0x24)
+    (name_length,) = struct.unpack_from("<H", buf, pos + 0x48)
+    if not MIN_FILETIME <= timestamp < MAX_FILETIME:
+        return None
+    if not 0 < name_length <= MAX_KEY_NAME_BYTES or pos + NK_HEADER_SIZE + name_length > end:
+        return None
+    if subkey_count > MAX_SUBKEY_COUNT or value_count > MAX_VALUE_COUNT:
+        return None
+    if parent != NO_OFFSET and (parent & 7 or HBIN_BASE + parent >= data_end):
+        return None
+    name = decode_name(buf[pos + NK_HEADER_SIZE:pos + NK_HEADER_SIZE + name_length], flags & NK_FLAG_ASCII_NAME)
+    if name is None:
+        return None
+    return {"flags": flags, "timestamp": timestamp, "parent": parent, "subkey_count": subkey_count,
+            "value_count": value_count, "value_list": value_list, "name": name}
+
+
+def parse_vk(buf, pos, end, data_end):
+    """Validate a candidate value record at pos (its "vk" signature); None if implausible."""
+    if pos + VK_HEADER_SIZE > end:
+        return None
+    name_length, data_size, data_offset, data_type, flags = struct.unpack_from("<HIIIH", buf, pos + 2)
+    if data_type > MAX_VALUE_TYPE or pos + VK_HEADER_SIZE + name_length > end:
+        return None
+    resident = bool(data_size & 0x80000000)
+    size = data_size & 0x7FFFFFFF
+    if resident and size > 4:
+        return None
+    if not resident and size and (data_offset & 7 or HBIN_BASE + data_offset >= data_end):
+        return None
+    if name_length:
+        name = decode_name(buf[pos + VK_HEADER_SIZE:pos + VK_HEADER_SIZE + name_length], flags & VK_FLAG_ASCII_NAME)
+        if name is None:
+            return None
+    else:
+        name = "(default)"
+    return {"name": name, "data_type": data_type, "data_size": size, "resident": resident,
+            "data_offset": data_offset}
+
+
+def value_data(buf, vk, data_end):
+    """Best-effort value data; a non-resident data cell may since have been reused."""
+    size = vk["data_size"]
+    if vk["resident"]:
+        raw = struct.pack("<I", vk["data_offset"])[:size]
+    else:
+        start = HBIN_BASE + vk["data_offset"] + 4
+        if not size or size > MAX_DATA_BYTES or start + size > data_end:
+            return None
+        raw = bytes(buf[start:start + size])
+
+    data_type = vk["data_type"]
+    if data_type in (1, 2, 7):
+        text = raw.decode("utf-16le", errors="replace").rstrip("\x00")
+        return text.split("\x00") if data_type == 7 else text
+    if data_type == 4 and len(raw) == 4:
+        return struct.unpack("<I", raw)[0]
+    if data_type == 11 and len(raw) == 8:
+        return struct.unpack("<Q", raw)[0]
+    return raw.hex()
+
+
+def cell_record(buf, offset, data_end):
+    """The nk record at a hive cell offset, allocated or not, or None."""
+    pos = HBIN_BASE + offset + 4
+    if offset == NO_OFFSET or offset & 7 or pos + NK_HEADER_SIZE > data_end or buf[pos:pos + 2] != b"nk":
+        return None
+    return parse_nk(buf, pos, data_end, data_end)
+
+
+def key_path(buf, nk, data_end, cache):
+    """Rebuild "Parent\\...\\Name" below the root; returns (path, complete).
+
+    cache maps key cell offsets to their (path, complete) and is filled for
+    every parent resolved on the way, so siblings share the work.
+    """
+    chain = []
+    prefix, complete = "", False
+    parent = nk["parent"]
+    for _ in range(MAX_KEY_DEPTH):
+        if parent in cache:
+            prefix, complete = cache[parent]
+            break
+        record = cell_record(buf, parent, data_end)
+        if record is None or any(offset == parent for offset, _ in chain):
+            break
+        if record["flags"] & NK_FLAG_ROOT:
+            cache[parent] = ("", True)
+            complete = True
+            break
+        chain.append((parent, record["name"]))
+        parent = record["parent"]
+
+    for offset, name in reversed(chain):
+        prefix = f"{prefix}\\{name}" if prefix else name
+        cache[offset] = (prefix, complete)
+    return (f"{prefix}\\{nk['name']}" if prefix else nk["name"]), complete
+
+
+def key_values(buf, nk, data_end):
+    """Values still reachable from a deleted key's value list."""
+    count, list_offset = nk["value_count"], nk["value_list"]
+    start = HBIN_BASE + list_offset + 4
+    if not count or list_offset == NO_OFFSET or list_offset & 7 or start + 4 * count > data_end:
+        return []
+    values = []
+    for (offset,) in struct.iter_unpack("<I", buf[start:start + 4 * count]):
+        pos = HBIN_BASE + offset + 4
+        if offset & 7 or pos + VK_HEADER_SIZE > data_end or buf[pos:pos + 2] != b"vk":
+            continue
+        vk = parse_vk(buf, pos, data_end, data_end)
+        if vk:
+            values.append({"name": vk["name"], "data_type": vk["data_type"], "data": value_data(buf, vk, data_end)})
+    return values
+
+
+def carve_cells(buf, hbins, data_end, keys=True, values=True):
+    """Yield recovered records from the free cells of the given HBINs."""
+    signatures = ([b"nk"] if keys else []) + ([b"vk"] if values else [])
+    path_cache = {}
+    for hbin_offset, hbin_size in hbins:
+        for start, end in free_cells(buf, hbin_offset, hbin_size):
+            for signature in signatures:
+                pos = buf.find(signature, start, end)
+                while pos != -1:
+                    # Records start 4 bytes into an 8-aligned cell
+                    if pos & 7 == 4:
+                        record = carve_record(buf, signature, pos, end, data_end, path_cache)
+                        if record:
+                            yield record
+                    pos = buf.find(signature, pos + 2, end)
+
+
+def carve_record(buf, signature, pos, end, data_end, path_cache):
+    offset = pos - 4 - HBIN_BASE
+    if signature == b"nk":
+        nk = parse_nk(buf, pos, end, data_end)
+        if nk is None:
+            return None
+        path, complete = key_path(buf, nk, data_end, path_cache)
+        path_cache[offset] = (path, complete)
+        return {"type": "key", "offset": offset, "path": path, "path_complete": complete,
+                "last_written": format_filetime(nk["timestamp"]), "subkey_count": nk["subkey_count"],
+                "value_count": nk["value_count"], "values": key_values(buf, nk, data_end)}
+
+    vk = parse_vk(buf, pos, end, data_end)
+    if vk is None:
+        return None
+    return {"type": "value", "offset": offset, "name": vk["name"], "data_type": vk["data_type"],
+            "data_size": vk["data_size"], "data": value_data(buf, vk, data_end)}
+
+
+def carve_range(hive_path, hbins, keys=True, values=True):
+    """Carve one HBIN range in a worker process; returns its records."""
+    buf = map_hive(hive_path)
+    try:
+        return list(carve_cells(buf, hbins, hbins_end(buf), keys, values))
+    finally:
+        buf.close()
+
+
+def carve_hive(hive_path, workers=CARVE_WORKERS, keys=True, values=True, stats=None):
+    """Yield deleted key and value records from a hive, in file order.
+
+    With workers > 1 the HBINs are split into ranges carved in separate
+    processes; stats, if given, receives the bytes scanned and the record count.
+    """
+    buf = map_hive(hive_path)
+    try:
+        data_end = hbins_end(buf)
+        hbins = list_hbins(buf)
+        if stats is not None:
+            stats["bytes"] = sum(size for _, size in hbins)
+            stats["hbins"] = len(hbins)
+            stats["records"] = 0
+
+        if workers <= 1:
+            for record in carve_cells(buf, hbins, data_end, keys, values):
+                if stats is not None:
+                    stats["records"] += 1
+                yield record
+            return
+    finally:
+        buf.close()
+
+    ranges = split_ranges(hbins, workers * RANGES_PER_WORKER)
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges) or 1)) as pool:
+        futures = [pool.submit(carve_range, hive_path, hbin_range, keys, values) for hbin_range in ranges]
+        for future in futures:
+            records = future.result()
+            if stats is not None:
+                stats["records"] += len(records)
+            yield from records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("hive")
+    parser.add_argument("--workers", type=int, default=CARVE_WORKERS, help="Worker processes (1 = in-process)")
+    kinds = parser.add_mutually_exclusive_group()
+    kinds.add_argument("--keys-only", action="store_true", help="Only recover deleted keys")
+    kinds.add_argument("--values-only", action="store_true", help="Only recover deleted values")
+    parser.add_argument("-o", "--output", help="Write NDJSON here instead of stdout")
+    args = parser.parse_args()
+
+    stats = {}
+    start = time.perf_counter()
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for record in carve_hive(args.hive, args.workers, keys=not args.values_only, values=not args.keys_only,
+                                 stats=stats):
+            out.write(json.dumps(record) + "\n")
+    finally:
+        if args.output:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    scanned = stats.get("bytes", 0)
+    print(f"{stats.get('records', 0)} records from {stats.get('hbins', 0)} HBINs, {scanned / 1e6:.1f} MB "
+          f"in {elapsed:.3f}s ({scanned / 1e6 / elapsed if elapsed else 0:.1f} MB/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
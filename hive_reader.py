@@ -0,0 +1,93 @@
+import os
+import mmap
+from Registry import Registry
+from Registry.RegistryParse import RegistryException
+
+# "mmap" maps the hive and lets the OS page in only the HBINs that are visited,
+# "read" is python-registry's default of reading the whole file into memory
+HIVE_BACKENDS = ("mmap", "read")
+HIVE_BACKEND = os.environ.get("HIVE_BACKEND", "mmap")
+
+
+class MappedHive:
+    """File-like object whose read() hands python-registry the memory map instead of a copy."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Key lookups jump around the file, so read-ahead would only inflate the resident set
+        if hasattr(self._map, "madvise") and hasattr(mmap, "MADV_RANDOM"):
+            self._map.madvise(mmap.MADV_RANDOM)
+
+    def read(self):
+        return self._map
+
+    def close(self):
+        self._map.close()
+
+
+# Function to open a registry hive with the configured backend
+def open_hive(path, backend=None):
+    backend = backend or HIVE_BACKEND
+    if backend not in HIVE_BACKENDS:
+        raise ValueError(f"Unknown hive backend: {backend}")
+
+    if backend == "read":
+        return Registry.Registry(path)
+
+    # The Registry object keeps the map alive; it is unmapped when the hive is released
+    return Registry.Registry(MappedHive(path))
+
+
+# Corrupt hives can contain subkey cycles; no real hive nests this deep
+MAX_KEY_DEPTH = 512
+
+
+def subkey_records(nk, errors=None):
+    try:
+        if nk.subkey_number() == 0:
+            return iter(())
+        return nk.subkey_list().keys()
+    except RegistryException:
+        if errors is not None:
+            errors["keys"] = errors.get("keys", 0) + 1
+        return iter(())
+
+
+# Walk every key of an open hive as (path below the root, NKRecord), root first with path ""
+def walk_keys(registry, errors=None):
+    # Work on the NK records directly; RegistryKey.subkeys() builds a full list per key,
+    # while this holds one subkey iterator per level. Unreadable subtrees are skipped
+    # and counted in errors["keys"].
+    root = registry.root()._nkrecord
+    yield "", root
+
+    paths = [""]
+    iterators = [subkey_records(root, errors)]
+    while iterators:
+        try:
+            nk = next(iterators[-1])
+        except StopIteration:
+            iterators.pop()
+            paths.pop()
+            continue
+        except RegistryException:
+            if errors is not None:
+                errors["keys"] = errors.get("keys", 0) + 1
+            iterators.pop()
+            paths.pop()
+            continue
+
+        try:
+            name = nk.name()
+        except RegistryException:
+            if errors is not None:
+                errors["keys"] = errors.get("keys", 0) + 1
+            continue
+        path = f"{paths[-1]}\\{name}" if paths[-1] else name
+        yield path, nk
+
+        if len(paths) < MAX_KEY_DEPTH:
+            paths.append(path)
+            iterators.append(subkey_records(nk, errors))
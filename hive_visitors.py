@@ -0,0 +1,192 @@
+"""
+Single-pass visitor framework for registry extraction.
+
+Extractors subclass KeyVisitor, name the hive they read and map key-path
+patterns to handler methods, and register with @register_visitor:
+
+    @register_visitor
+    class ComputerName(KeyVisitor):
+        hive = "SYSTEM"
+        patterns = {"{ControlSet}\\\\Control\\\\ComputerName\\\\ComputerName": "visit_name"}
+
+Patterns are relative to the hive root, case-insensitive, and may use * ? [...]
+within a path component (never across a backslash). {ControlSet} stands for
+the active control set, read from Select\\Current once per hive.
+
+All patterns of a hive are merged into one trie, and a single depth-first pass
+descends only into subkeys that some pattern can still match, handing each
+matching key to every handler interested in it. Twenty extractors on the same
+subtrees therefore cost about one traversal.
+"""
+
+from fnmatch import fnmatchcase
+from Registry import Registry
+from Registry.RegistryParse import RegistryException, RegistryStructureDoesNotExist
+from hive_reader import open_hive, subkey_records, MAX_KEY_DEPTH
+
+CONTROL_SET = "{ControlSet}"
+DEFAULT_CONTROL_SET = "ControlSet001"
+
+WILDCARD_CHARS = frozenset("*?[")
+
+# Visitor classes per hive, in registration order; results are merged in this order
+VISITORS = {}
+
+# Error counts that mean a pass may have missed data it could read next time
+FAILURE_COUNTS = ("hive", "keys", "handlers")
+
+
+class KeyVisitor:
+    """Base class for extractors; one instance is created per hive pass."""
+
+    hive = None
+    # Key-path pattern -> name of the method called as handler(path, key) for each matching key
+    patterns = {}
+
+    def __init__(self, control_set=DEFAULT_CONTROL_SET):
+        self.control_set = control_set
+
+    def result(self):
+        """Report fields contributed once the pass is over."""
+        return {}
+
+
+def register_visitor(cls):
+    VISITORS.setdefault(cls.hive, []).append(cls)
+    return cls
+
+
+class PatternNode:
+    __slots__ = ("literals", "wildcards", "handlers")
+
+    def __init__(self):
+        self.literals = {}
+        self.wildcards = []
+        self.handlers = []
+
+    def child(self, part):
+        if WILDCARD_CHARS.intersection(part):
+            for pattern, node in self.wildcards:
+                if pattern == part:
+                    return node
+            node = PatternNode()
+            self.wildcards.append((part, node))
+            return node
+        return self.literals.setdefault(part, PatternNode())
+
+    def matches(self, name):
+        node = self.literals.get(name)
+        if node is not None:
+            yield node
+        for pattern, node in self.wildcards:
+            if fnmatchcase(name, pattern):
+                yield node
+
+
+def build_pattern_trie(visitors):
+    root = PatternNode()
+    for visitor in visitors:
+        for pattern, method in visitor.patterns.items():
+            node = root
+            for part in pattern.replace(CONTROL_SET, visitor.control_set).lower().split("\\"):
+                if part:
+                    node = node.child(part)
+            node.handlers.append((visitor, getattr(visitor, method)))
+    return root
+
+
+def resolve_control_set(registry):
+    """ControlSetNNN named by Select\\Current; ControlSet001 if the hive has no Select key."""
+    try:
+        current = registry.open("Select").value("Current").value()
+        return f"ControlSet{int(current):03d}"
+    except (RegistryException, TypeError, ValueError):
+        return DEFAULT_CONTROL_SET
+
+
+def record_failure(errors, visitor, path, error):
+    count = "missing" if isinstance(error, RegistryStructureDoesNotExist) else "handlers"
+    errors[count] = errors.get(count, 0) + 1
+    failures = errors.setdefault("visitors", {}).setdefault(type(visitor).__name__, {"first_error": f"{path}: {error}"})
+    failures[count] = failures.get(count, 0) + 1
+
+
+def visit_hive(registry, visitors, errors=None):
+    """Make one pruned depth-first pass, calling each handler for the keys its pattern matches.
+
+    A failing handler is counted in errors["handlers"] and does not stop the
+    pass or the other visitors; unreadable subtrees are counted in errors["keys"].
+    A handler reading a key or value the hive does not have is counted in
+    errors["missing"] instead, since that is the hive's content, not a failure.
+    Both are also tallied per visitor in errors["visitors"], with the first
+    failure's path and message.
+    """
+    root = build_pattern_trie(visitors)
+    iterators = [(subkey_records(registry.root()._nkrecord, errors), "", [root])]
+    while iterators:
+        records, parent_path, nodes = iterators[-1]
+        try:
+            nk = next(records)
+            name = nk.name()
+        except StopIteration:
+            iterators.pop()
+            continue
+        except RegistryException:
+            if errors is not None:
+                errors["keys"] = errors.get("keys", 0) + 1
+            continue
+
+        lower = name.lower()
+        matched = [child for node in nodes for child in node.matches(lower)]
+        if not matched:
+            continue
+
+        path = f"{parent_path}\\{name}" if parent_path else name
+        key = None
+        for node in matched:
+            for visitor, handler in node.handlers:
+                if key is None:
+                    key = Registry.RegistryKey(nk)
+                try:
+                    handler(path, key)
+                except Exception as e:
+                    if errors is not None:
+                        record_failure(errors, visitor, path, e)
+
+        # Only descend where some pattern continues below this key
+        if len(iterators) < MAX_KEY_DEPTH and any(node.literals or node.wildcards for node in matched):
+            iterators.append((subkey_records(nk, errors), path, matched))
+
+
+def is_clean_run(errors):
+    """True when a pass recorded in errors read everything it was after, so its result can be reused."""
+    return not any(errors.get(count) for count in FAILURE_COUNTS)
+
+
+def extract_hive(hive_name, hive_path, visitor_classes=None, errors=None):
+    """Run every visitor registered for hive_name (or the given classes) over one pass of the hive.
+
+    A hive that cannot be opened or walked is counted in errors["hive"].
+    """
+    visitor_classes = VISITORS.get(hive_name, []) if visitor_classes is None else visitor_classes
+    errors = {} if errors is None else errors
+    forensic_data = {}
+    try:
+        registry = open_hive(hive_path)
+        control_set = DEFAULT_CONTROL_SET
+        if any(CONTROL_SET in pattern for cls in visitor_classes for pattern in cls.patterns):
+            control_set = resolve_control_set(registry)
+
+        visitors = [cls(control_set) for cls in visitor_classes]
+        visit_hive(registry, visitors, errors)
+        for visitor in visitors:
+            forensic_data.update(visitor.result())
+    except Exception as e:
+        errors["hive"] = errors.get("hive", 0) + 1
+        print(f"An error occurred while processing {hive_name} hive: {e}")
+
+    # One line per visitor that failed, however many keys it failed on
+    for name, failures in errors.get("visitors", {}).items():
+        count = failures.get("handlers", 0) + failures.get("missing", 0)
+        print(f"{name} could not read {count} key(s) in the {hive_name} hive, first {failures['first_error']}")
+    return forensic_data
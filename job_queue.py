@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Queue state lives in a local SQLite file so submitted jobs survive restarts
+JOBS_DB = "jobs.db"
+
+JOB_STATES = ("queued", "running", "done", "failed")
+
+# Each queue refreshes the heartbeat of the jobs it is running this often; a running job whose
+# heartbeat is older than HEARTBEAT_TIMEOUT belongs to a process that is gone and is requeued
+HEARTBEAT_SECONDS = 10
+HEARTBEAT_TIMEOUT = 60
+
+
+class JobQueue:
+    """Background jobs run by a bounded thread pool, with status and results stored per job."""
+
+    def __init__(self, runner, path=JOBS_DB, max_concurrency=2):
+        self.runner = runner
+        self.path = path
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="job")
+        self.lock = threading.Lock()
+        self.started = False
+        # Identifies this queue in the jobs it claims, so processes sharing the database keep apart
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.stopping = threading.Event()
+        self.heartbeat_thread = None
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, status TEXT NOT NULL, "
+                "submitted_at REAL NOT NULL, started_at REAL, finished_at REAL, result TEXT, error TEXT, "
+                "owner TEXT, heartbeat REAL)"
+            )
+            # Databases from before jobs had owners; their running rows have no heartbeat and are requeued
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in (("owner", "TEXT"), ("heartbeat", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, submitted_at)")
+
+    def _connect(self):
+        # One short-lived connection per call keeps worker threads independent
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def start(self):
+        """Resume queued jobs and jobs left running by a process that is gone."""
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        with self._connect() as conn:
+            self._requeue_orphans(conn)
+            pending = [row["id"] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY submitted_at")]
+        for job_id in pending:
+            self.executor.submit(self._run, job_id)
+        self.heartbeat_thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        self.heartbeat_thread.start()
+
+    def _requeue_orphans(self, conn):
+        # Only jobs whose owner stopped heartbeating; another live process's jobs stay with it
+        cursor = conn.execute(
+            "UPDATE jobs SET status = 'queued', started_at = NULL, owner = NULL, heartbeat = NULL "
+            "WHERE status = 'running' AND (heartbeat IS NULL OR heartbeat < ?)",
+            (time.time() - HEARTBEAT_TIMEOUT,)
+        )
+        return cursor.rowcount
+
+    def _heartbeat(self):
+        while not self.stopping.wait(HEARTBEAT_SECONDS):
+            try:
+                with self._connect() as conn:
+                    conn.execute("UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status = 'running'",
+                                 (time.time(), self.owner))
+                    requeued = self._requeue_orphans(conn)
+                    pending = [row["id"] for row in conn.execute(
+                        "SELECT id FROM jobs WHERE status = 'queued' ORDER BY submitted_at")] if requeued else []
+            except sqlite3.Error as e:
+                print(f"Job heartbeat failed: {e}")
+                continue
+            # Claiming is atomic, so a job some other queue also picks up still runs once
+            for job_id in pending:
+                self.executor.submit(self._run, job_id)
+
+    def submit(self, kind, payload):
+        self.start()
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, submitted_at) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, kind, json.dumps(payload), time.time())
+            )
+        self.executor.submit(self._run, job_id)
+        return job_id
+
+    def _run(self, job_id):
+        # Claim in one statement: of several queues racing for the job, exactly one updates the row
+        now = time.time()
+        with self._connect() as conn:
+            claimed = conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, owner = ?, heartbeat = ? "
+                "WHERE id = ? AND status = 'queued'",
+                (now, self.owner, now, job_id)
+            ).rowcount
+            if not claimed:
+                return
+            row = conn.execute("SELECT kind, payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+        try:
+            result = self.runner(row["kind"], json.loads(row["payload"]))
+            update = ("done", json.dumps(result), None)
+        except Exception as e:
+            update = ("failed", None, str(e))
+
+        # Skipped if the job was requeued meanwhile and now belongs to another queue
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? "
+                         "WHERE id = ? AND owner = ?",
+                         (*update, time.time(), job_id, self.owner))
+
+    def get(self, job_id, include_result=False):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+
+        job = {
+            "id": row["id"],
+            "kind": row["kind"],
+            "payload": json.loads(row["payload"]),
+            "status": row["status"],
+            "submitted_at": row["submitted_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+            "queued_seconds": None,
+            "run_seconds": None,
+        }
+        if row["started_at"]:
+            job["queued_seconds"] = round(row["started_at"] - row["submitted_at"], 3)
+            if row["finished_at"]:
+                job["run_seconds"] = round(row["finished_at"] - row["started_at"], 3)
+        if row["error"]:
+            job["error"] = row["error"]
+        if include_result and row["result"] is not None:
+            job["result"] = json.loads(row["result"])
+        return job
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+        self.stopping.set()
@@ -0,0 +1,212 @@
+"""
+Persistent key-path index for registry hives.
+
+One walk over a hive writes a sidecar SQLite file (cached under key_index/,
+never next to the evidence unless asked) mapping every normalized key path
+(lowercase, relative to the root) to the absolute offset of its NK cell.
+Lookups then seek straight to the cell instead of resolving each path
+component from the root, and glob patterns are answered from the sorted path
+column. The sidecar records the hive's size, mtime and header sequence numbers
+and is rebuilt whenever any of them change.
+
+This is a query tool for repeated ad-hoc lookups and glob queries; the report
+extractors read each hive in one pruned pass instead (see hive_visitors.py).
+
+    python key_index.py build path/to/SYSTEM
+    python key_index.py glob path/to/SYSTEM "ControlSet00*\\Enum\\USBSTOR\\*"
+"""
+
+import os
+import json
+import struct
+import sqlite3
+import hashlib
+import argparse
+import tempfile
+from fnmatch import fnmatchcase
+from urllib.request import pathname2url
+from Registry import Registry
+from Registry.RegistryParse import NKRecord
+from hive_reader import open_hive, walk_keys
+
+KEY_INDEX_VERSION = 1
+KEY_INDEX_SUFFIX = ".keyidx"
+
+# Sidecars live in a local cache directory keyed like hive_index/, so building
+# one never writes into the evidence folder; they only go next to the hive when
+# asked for explicitly, and fall back to the temp directory if that fails
+KEY_INDEX_DIR = os.environ.get("KEY_INDEX_DIR", "key_index")
+
+
+def normalize_key_path(path):
+    return "\\".join(part for part in path.split("\\") if part).lower()
+
+
+def hive_signature(hive_path):
+    """Size, mtime and the two REGF sequence numbers; any change invalidates the index."""
+    st = os.stat(hive_path)
+    with open(hive_path, "rb") as f:
+        header = f.read(12)
+    sequence1, sequence2 = struct.unpack_from("<II", header, 4) if len(header) == 12 else (0, 0)
+    return {"version": KEY_INDEX_VERSION, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+            "sequence1": sequence1, "sequence2": sequence2}
+
+
+def index_path_for(hive_path, index_dir=None, beside_hive=False):
+    if beside_hive:
+        return hive_path + KEY_INDEX_SUFFIX
+    digest = hashlib.sha256(os.path.abspath(hive_path).encode("utf-8")).hexdigest()[:32]
+    return os.path.join(index_dir or KEY_INDEX_DIR, digest + KEY_INDEX_SUFFIX)
+
+
+def read_only_uri(path):
+    # Quoted, so "?", "#", "%" and spaces in mount paths stay part of the file name
+    return "file:" + pathname2url(os.path.abspath(path)) + "?mode=ro"
+
+
+def read_signature(index_path):
+    try:
+        conn = sqlite3.connect(read_only_uri(index_path), uri=True)
+        try:
+            return json.loads(conn.execute("SELECT value FROM meta WHERE key = 'signature'").fetchone()[0])
+        finally:
+            conn.close()
+    except (sqlite3.Error, TypeError, ValueError):
+        return None
+
+
+def build_key_index(hive_path, index_path, registry=None):
+    """Walk the hive once and write the path -> NK offset sidecar; returns the number of keys."""
+    signature = hive_signature(hive_path)
+    registry = registry or open_hive(hive_path)
+
+    # Build under a temporary name so readers never see a half-written index
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.execute("CREATE TABLE keys (path TEXT PRIMARY KEY, offset INTEGER NOT NULL) WITHOUT ROWID")
+        count = 0
+        batch = []
+        for path, nk in walk_keys(registry):
+            batch.append((normalize_key_path(path), nk.offset()))
+            if len(batch) >= 10000:
+                conn.executemany("INSERT OR IGNORE INTO keys (path, offset) VALUES (?, ?)", batch)
+                count += len(batch)
+                batch = []
+        conn.executemany("INSERT OR IGNORE INTO keys (path, offset) VALUES (?, ?)", batch)
+        count += len(batch)
+        conn.execute("INSERT INTO meta (key, value) VALUES ('signature', ?)", (json.dumps(signature),))
+        conn.execute("INSERT INTO meta (key, value) VALUES ('hive_path', ?)", (os.path.abspath(hive_path),))
+        conn.commit()
+    except BaseException:
+        conn.close()
+        os.remove(tmp_path)
+        raise
+    conn.close()
+    os.replace(tmp_path, index_path)
+    return count
+
+
+class KeyIndex:
+    """Direct key lookups and glob queries over a hive through its sidecar index."""
+
+    def __init__(self, hive_path, index_dir=None, registry=None, beside_hive=False):
+        self.hive_path = hive_path
+        self.registry = registry or open_hive(hive_path)
+        self.rebuilt = False
+        self.index_path = self._ensure_index(index_path_for(hive_path, index_dir, beside_hive))
+        self.conn = sqlite3.connect(read_only_uri(self.index_path), uri=True, check_same_thread=False)
+        self.first_hbin = next(self.registry._regf.hbins())
+
+    def _ensure_index(self, index_path):
+        if read_signature(index_path) == hive_signature(self.hive_path):
+            return index_path
+        self.rebuilt = True
+        try:
+            os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+            build_key_index(self.hive_path, index_path, self.registry)
+        except (OSError, sqlite3.Error):
+            fallback_dir = os.path.join(tempfile.gettempdir(), "key_index")
+            os.makedirs(fallback_dir, exist_ok=True)
+            index_path = index_path_for(self.hive_path, fallback_dir)
+            if read_signature(index_path) != hive_signature(self.hive_path):
+                build_key_index(self.hive_path, index_path, self.registry)
+        return index_path
+
+    def key_at(self, offset):
+        return Registry.RegistryKey(NKRecord(self.registry._buf, offset, self.first_hbin))
+
+    def offset(self, path):
+        row = self.conn.execute("SELECT offset FROM keys WHERE path = ?", (normalize_key_path(path),)).fetchone()
+        return row[0] if row else None
+
+    def open(self, path):
+        """Same result as Registry.open(path), found with one index seek."""
+        offset = self.offset(path)
+        if offset is None:
+            raise Registry.RegistryKeyNotFoundException(path)
+        return self.key_at(offset)
+
+    def glob(self, pattern):
+        """Yield (path, RegistryKey) for keys matching pattern; wildcards never cross a backslash."""
+        pattern = normalize_key_path(pattern)
+        parts = pattern.split("\\")
+        # SQLite's GLOB uses the path index for the literal prefix; "*" there also
+        # matches backslashes, so each candidate is checked part by part
+        rows = self.conn.execute("SELECT path, offset FROM keys WHERE path GLOB ? ORDER BY path", (pattern,))
+        for path, offset in rows:
+            path_parts = path.split("\\")
+            if len(path_parts) == len(parts) and all(map(fnmatchcase, path_parts, parts)):
+                key = self.key_at(offset)
+                yield key.path(), key
+
+    def stats(self):
+        keys = self.conn.execute("SELECT COUNT(*) FROM keys").fetchone()[0]
+        return {"index_path": self.index_path, "keys": keys, "rebuilt": self.rebuilt,
+                "bytes": os.path.getsize(self.index_path)}
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index-dir", help=f"Directory for sidecar files (default: {KEY_INDEX_DIR})")
+    parser.add_argument("--beside-hive", action="store_true", help="Write the sidecar next to the hive instead")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Build or refresh the index for hives")
+    build.add_argument("hives", nargs="+")
+
+    get = commands.add_parser("get", help="Look up keys by exact path")
+    get.add_argument("hive")
+    get.add_argument("paths", nargs="+")
+
+    glob = commands.add_parser("glob", help="List keys matching a pattern such as ControlSet00*\\Enum\\USBSTOR\\*")
+    glob.add_argument("hive")
+    glob.add_argument("pattern")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        for hive_path in args.hives:
+            index = KeyIndex(hive_path, args.index_dir, beside_hive=args.beside_hive)
+            print(json.dumps({"hive": hive_path, **index.stats()}))
+            index.close()
+        return
+
+    index = KeyIndex(args.hive, args.index_dir, beside_hive=args.beside_hive)
+    try:
+        if args.command == "get":
+            for path in args.paths:
+                offset = index.offset(path)
+                print(f"{path}: {'not found' if offset is None else index.key_at(offset).path()}")
+        else:
+            for path, key in index.glob(args.pattern):
+                print(f"{key.timestamp().isoformat()}  {path}")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
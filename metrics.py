@@ -0,0 +1,199 @@
+"""
+Lightweight timing spans and Prometheus-text metrics.
+
+    with span("hive_index"):
+        ...
+
+Each span is observed into a histogram and, while a collection is active on
+the current thread (one per Flask request), also kept so the request can
+report its stages in a Server-Timing header. With METRICS_ENABLED=0, span()
+returns a shared no-op context manager and observations return immediately.
+"""
+
+import os
+import re
+import time
+import threading
+from bisect import bisect_left
+from contextlib import nullcontext
+
+ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = {}
+_local = threading.local()
+_noop = nullcontext()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _label_text(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        # label values -> [per-bucket counts..., +Inf bucket, sum, count]; cumulated when rendered
+        self.series = {}
+        _registry[name] = self
+
+    def observe(self, value, **labels):
+        if not ENABLED:
+            return
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0] * (len(self.buckets) + 3)
+            series[bisect_left(self.buckets, value)] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            items = sorted((key, list(series)) for key, series in self.series.items())
+        for key, series in items:
+            count = 0
+            for bound, bucket_count in zip(self.buckets, series):
+                count += bucket_count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {count}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.series = {}
+        _registry[name] = self
+
+    def inc(self, amount=1, **labels):
+        if not ENABLED:
+            return
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + amount
+        # Collected with the spans (without a stage name) so pool workers can hand them back too
+        spans = getattr(_local, "spans", None)
+        if spans is not None:
+            spans.append((None, amount, self.name, labels))
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            items = sorted(self.series.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_label_text(self.labelnames, key)} {value}")
+        return lines
+
+
+ROUTE_SECONDS = Histogram("http_request_duration_seconds", "Flask route latency.", ("route", "method", "status"))
+STAGE_SECONDS = Histogram("stage_duration_seconds", "Time spent in each instrumented stage.", ("stage",))
+HIVE_PARSE_SECONDS = Histogram("hive_parse_seconds", "Time to extract forensic data from one hive.", ("hive",))
+ROWS_SCANNED = Counter("browser_rows_scanned_total", "History rows checked by the browser scanner.")
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by cache and result.", ("cache", "result"))
+
+
+class Span:
+    __slots__ = ("name", "histogram", "labels", "start")
+
+    def __init__(self, name, histogram, labels):
+        self.name = name
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(self.name, time.perf_counter() - self.start, self.histogram, **self.labels)
+        return False
+
+
+def span(name, histogram=None, **labels):
+    """Time a block into histogram (the per-stage histogram by default)."""
+    if not ENABLED:
+        return _noop
+    return Span(name, histogram, labels)
+
+
+def record(name, seconds, histogram=None, **labels):
+    """Record an already measured duration as if it had been a span."""
+    if not ENABLED:
+        return
+    if histogram is None:
+        histogram, labels = STAGE_SECONDS, {"stage": name}
+    histogram.observe(seconds, **labels)
+    spans = getattr(_local, "spans", None)
+    if spans is not None:
+        spans.append((name, seconds, histogram.name, labels))
+
+
+def start_collection():
+    _local.spans = []
+
+
+def finish_collection():
+    spans = getattr(_local, "spans", None) or []
+    _local.spans = None
+    return spans
+
+
+def collect_spans(fn, *args, **kwargs):
+    """Run fn and return (result, spans); used in pool workers so the parent can replay them."""
+    start_collection()
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        spans = finish_collection()
+    return result, spans
+
+
+def replay(spans):
+    """Record spans collected in another process (e.g. a pool worker) in this one."""
+    for name, value, metric_name, labels in spans:
+        if name is None:
+            _registry[metric_name].inc(value, **labels)
+        else:
+            record(name, value, _registry.get(metric_name), **labels)
+
+
+def server_timing(spans, total=None):
+    """Server-Timing header value; repeated stages are summed into one entry."""
+    durations = {}
+    for name, seconds, _, _ in spans:
+        if name is None:
+            continue
+        token = re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+        durations[token] = durations.get(token, 0.0) + seconds
+    entries = [f"{token};dur={seconds * 1000:.2f}" for token, seconds in durations.items()]
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+def render():
+    lines = []
+    for metric in _registry.values():
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
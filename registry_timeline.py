@@ -0,0 +1,195 @@
+"""
+Full-hive timeline of every key's last-write time.
+
+Keys are streamed depth-first straight from the hive cells, filtered to the
+requested time window, and sorted with an external merge sort: records are
+buffered up to a fixed count, each full buffer is sorted and spilled to a
+temporary run file, and the runs are merged with at most MERGE_FAN_IN files
+open at once. Peak memory depends on the run size, not on the hive size.
+
+    python registry_timeline.py path/to/image --start 2024-01-01 --end 2024-02-01 -o timeline.csv
+    python registry_timeline.py path/to/SOFTWARE --format ndjson
+"""
+
+import os
+import sys
+import csv
+import json
+import heapq
+import argparse
+import tempfile
+from datetime import datetime, timedelta, timezone
+from Registry.RegistryParse import RegistryException
+from forensics_script import filetime_to_datetime, load_hive_index
+from hive_reader import open_hive, walk_keys
+
+TIMELINE_FORMATS = ("csv", "ndjson")
+
+# Records held in memory before a sorted run is spilled to disk
+RUN_RECORDS = int(os.environ.get("TIMELINE_RUN_RECORDS", "100000"))
+
+# Run files merged at once; more runs are merged in several passes
+MERGE_FAN_IN = 64
+
+FILETIME_EPOCH = datetime(1601, 1, 1, tzinfo=timezone.utc)
+
+
+def datetime_to_filetime(dt):
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return (dt - FILETIME_EPOCH) // timedelta(microseconds=1) * 10
+
+
+def format_filetime(filetime):
+    try:
+        return filetime_to_datetime(filetime).isoformat()
+    except (OverflowError, OSError, ValueError):
+        return f"FILETIME:{filetime}"
+
+
+def iter_key_times(hive_path, errors=None):
+    """Yield (filetime, key path) for every key in the hive, depth-first."""
+    registry = open_hive(hive_path)
+    root_name = None
+    for path, nk in walk_keys(registry, errors):
+        if root_name is None:
+            root_name = nk.name()
+        yield nk.unpack_qword(0x4), f"{root_name}\\{path}" if path else root_name
+
+
+def timeline_hives(source):
+    """Return (label, path) for a single hive file, or for every system and user hive in an image folder."""
+    if os.path.isfile(source):
+        return [(os.path.basename(source), source)]
+
+    index = load_hive_index(source)
+    hives = list(index["hives"].items())
+    for user_hive in index["user_hives"]:
+        hives.append((os.path.relpath(user_hive["path"], index["root"]).replace(os.sep, "/"), user_hive["path"]))
+    return hives
+
+
+def iter_timeline(hives, start=None, end=None, errors=None):
+    """Yield unsorted (filetime, hive, key path) records inside [start, end)."""
+    for label, hive_path in hives:
+        try:
+            for filetime, path in iter_key_times(hive_path, errors):
+                if (start is None or filetime >= start) and (end is None or filetime < end):
+                    yield filetime, label, path
+        except (RegistryException, OSError) as e:
+            print(f"Could not read {hive_path}: {e}", file=sys.stderr)
+
+
+def write_run(records, tmp_dir):
+    fd, run_path = tempfile.mkstemp(prefix="timeline-run-", suffix=".ndjson", dir=tmp_dir)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    return run_path
+
+
+def read_run(run_path):
+    with open(run_path, "r", encoding="utf-8") as f:
+        for line in f:
+            yield tuple(json.loads(line))
+
+
+def merge_runs(run_paths, tmp_dir, fan_in=MERGE_FAN_IN):
+    """Yield the merged records of sorted run files, merging in passes if there are too many to open at once."""
+    while len(run_paths) > fan_in:
+        merged = []
+        for i in range(0, len(run_paths), fan_in):
+            group = run_paths[i:i + fan_in]
+            merged.append(write_run(heapq.merge(*(read_run(path) for path in group)), tmp_dir))
+            for path in group:
+                os.remove(path)
+        run_paths = merged
+
+    try:
+        yield from heapq.merge(*(read_run(path) for path in run_paths))
+    finally:
+        for path in run_paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def external_sort(records, run_records=RUN_RECORDS, tmp_dir=None):
+    """Sort records of any count while holding at most run_records of them in memory."""
+    run_paths = []
+    buffer = []
+    try:
+        for record in records:
+            buffer.append(record)
+            if len(buffer) >= run_records:
+                buffer.sort()
+                run_paths.append(write_run(buffer, tmp_dir))
+                buffer = []
+    except BaseException:
+        for path in run_paths:
+            os.remove(path)
+        raise
+
+    buffer.sort()
+    # Everything fit in one buffer, so nothing needs to touch the disk
+    if not run_paths:
+        yield from buffer
+        return
+    if buffer:
+        run_paths.append(write_run(buffer, tmp_dir))
+    del buffer
+    yield from merge_runs(run_paths, tmp_dir)
+
+
+def write_timeline(records, out, fmt="csv"):
+    count = 0
+    if fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(["timestamp", "hive", "key_path"])
+        for filetime, hive, path in records:
+            writer.writerow([format_filetime(filetime), hive, path])
+            count += 1
+    else:
+        for filetime, hive, path in records:
+            out.write(json.dumps({"timestamp": format_filetime(filetime), "hive": hive, "key_path": path}) + "\n")
+            count += 1
+    return count
+
+
+def parse_time(value):
+    return datetime_to_filetime(datetime.fromisoformat(value))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="+", help="Hive files or image folders")
+    parser.add_argument("--format", choices=TIMELINE_FORMATS, default="csv")
+    parser.add_argument("--start", type=parse_time, help="Only keys written at or after this ISO time (UTC if no zone)")
+    parser.add_argument("--end", type=parse_time, help="Only keys written before this ISO time (UTC if no zone)")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    parser.add_argument("--run-records", type=int, default=RUN_RECORDS, help="Records sorted in memory per run")
+    parser.add_argument("--tmp-dir", help="Directory for sorted run files")
+    args = parser.parse_args()
+
+    hives = [hive for source in args.sources for hive in timeline_hives(source)]
+    if not hives:
+        print("No registry hives found.", file=sys.stderr)
+        sys.exit(1)
+
+    errors = {}
+    records = external_sort(iter_timeline(hives, args.start, args.end, errors), args.run_records, args.tmp_dir)
+    if args.output:
+        with open(args.output, "w", newline="", encoding="utf-8", errors="backslashreplace") as out:
+            count = write_timeline(records, out, args.format)
+    else:
+        count = write_timeline(records, sys.stdout, args.format)
+
+    summary = f"{count} keys from {len(hives)} hives"
+    if errors.get("keys"):
+        summary += f", {errors['keys']} unreadable keys skipped"
+    print(summary, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+from browser_scan import (is_malicious, verdict_version, open_history, build_scan_result, brave_history_path,
+                          chrome_time_to_datetime, firefox_time_to_datetime, BATCH_SIZE)
+from metrics import ROWS_SCANNED
+
+# Watermarks and seen-URL verdicts for incremental browser scans
+STATE_FILE = "scan_state.db"
+
+# Seen URLs not visited again within this window are dropped by compact()
+SEEN_MAX_AGE_DAYS = 30
+
+# New visits since the watermark, one row per URL with its latest visit; both use the visit-time index
+NEW_VISITS_QUERIES = {
+    "chromium": ("visits", chrome_time_to_datetime, """
+        SELECT urls.url, urls.title, MAX(visits.visit_time)
+        FROM visits JOIN urls ON urls.id = visits.url
+        WHERE visits.visit_time > ?
+        GROUP BY visits.url
+    """),
+    "firefox": ("moz_historyvisits", firefox_time_to_datetime, """
+        SELECT moz_places.url, moz_places.title, MAX(moz_historyvisits.visit_date)
+        FROM moz_historyvisits JOIN moz_places ON moz_places.id = moz_historyvisits.place_id
+        WHERE moz_historyvisits.visit_date > ?
+        GROUP BY moz_historyvisits.place_id
+    """),
+}
+
+
+def url_hash(url):
+    return hashlib.blake2b(url.encode("utf-8", "surrogatepass"), digest_size=8).digest()
+
+
+class ScanState:
+    """Per-profile last_visit_time watermarks plus verdicts for URLs already checked."""
+
+    def __init__(self, path=STATE_FILE):
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS watermarks ("
+            "profile TEXT PRIMARY KEY, last_visit_time INTEGER NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen_urls ("
+            "profile TEXT NOT NULL, url_hash BLOB NOT NULL, reason TEXT, last_seen REAL NOT NULL, version TEXT, "
+            "PRIMARY KEY (profile, url_hash)) WITHOUT ROWID"
+        )
+        # Stores from before verdicts were versioned; their rows have no version and get re-checked
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(seen_urls)")}
+        if "version" not in columns:
+            self.conn.execute("ALTER TABLE seen_urls ADD COLUMN version TEXT")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS seen_urls_last_seen ON seen_urls (last_seen)")
+        self.conn.commit()
+
+    def watermark(self, profile):
+        row = self.conn.execute("SELECT last_visit_time FROM watermarks WHERE profile = ?", (profile,)).fetchone()
+        return row[0] if row else 0
+
+    def set_watermark(self, profile, last_visit_time):
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO watermarks (profile, last_visit_time, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(profile) DO UPDATE SET last_visit_time = excluded.last_visit_time, "
+                "updated_at = excluded.updated_at",
+                (profile, last_visit_time, time.time())
+            )
+
+    def verdicts(self, profile, hashes, version):
+        """Return {url_hash: reason} for the hashes already checked for this profile against version."""
+        found = {}
+        hashes = list(hashes)
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(self.conn.execute(
+                f"SELECT url_hash, reason FROM seen_urls "
+                f"WHERE profile = ? AND version = ? AND url_hash IN ({placeholders})",
+                (profile, version, *chunk)
+            ).fetchall())
+        return found
+
+    def record(self, profile, verdicts, version):
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO seen_urls (profile, url_hash, reason, last_seen, version) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(profile, url_hash) DO UPDATE SET reason = excluded.reason, "
+                "last_seen = excluded.last_seen, version = excluded.version",
+                ((profile, key, reason, now, version) for key, reason in verdicts.items())
+            )
+
+    def compact(self, max_age_days=SEEN_MAX_AGE_DAYS):
+        """Drop seen URLs not visited within max_age_days and reclaim the space."""
+        cutoff = time.time() - max_age_days * 86400
+        with self.conn:
+            removed = self.conn.execute("DELETE FROM seen_urls WHERE last_seen < ?", (cutoff,)).rowcount
+        self.conn.execute("VACUUM")
+        return removed
+
+    def stats(self):
+        profiles = self.conn.execute("SELECT COUNT(*) FROM watermarks").fetchone()[0]
+        seen = self.conn.execute("SELECT COUNT(*) FROM seen_urls").fetchone()[0]
+        return {"profiles": profiles, "seen_urls": seen}
+
+    def close(self):
+        self.conn.close()
+
+
+def iter_new_history(state, history_path, family="chromium", batch_size=BATCH_SIZE, stats=None, immutable=False):
+    """Yield entries for URLs visited since the profile's watermark, then advance the watermark.
+
+    Only URLs never checked before go through is_malicious; earlier verdicts are
+    reused while the domain lists are the ones that produced them (see
+    verdict_version), so a steady-state run costs O(new visits) and a list
+    update re-checks URLs as they come up again. The watermark moves only once
+    every new row has been consumed.
+    """
+    profile = os.path.abspath(history_path)
+    table, to_datetime, query = NEW_VISITS_QUERIES[family]
+    version = verdict_version()
+    watermark = state.watermark(profile)
+    newest = watermark
+
+    with open_history(history_path, immutable, table=table) as conn:
+        cursor = conn.execute(query, (watermark,))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+
+            hashes = [url_hash(url) for url, _, _ in rows]
+            known = state.verdicts(profile, hashes, version)
+            verdicts = {}
+            batch = []
+            for (url, title, visit_time), key in zip(rows, hashes):
+                if key in known:
+                    reason = known[key]
+                else:
+                    reason = is_malicious(url)
+                verdicts[key] = reason
+
+                converted = to_datetime(visit_time)
+                entry = {"url": url, "title": title, "last_visit": converted.isoformat() if converted else None}
+                if reason:
+                    entry["reason"] = reason
+                batch.append(entry)
+                newest = max(newest, visit_time or 0)
+
+            state.record(profile, verdicts, version)
+            ROWS_SCANNED.inc(len(rows))
+            if stats is not None:
+                stats["rows"] = stats.get("rows", 0) + len(rows)
+                stats["checked"] = stats.get("checked", 0) + len(rows) - len(known)
+                stats["reused"] = stats.get("reused", 0) + len(known)
+            yield from batch
+
+    if newest > watermark:
+        state.set_watermark(profile, newest)
+
+
+def scan_incremental(history_path=None, family="chromium", browser="Brave", state_path=STATE_FILE, immutable=False):
+    """Scan only what is new since the last run and return the usual report shape."""
+    history_path = history_path or brave_history_path()
+    if not os.path.exists(history_path):
+        return {"error": f"{browser} history not found"}
+
+    state = ScanState(state_path)
+    try:
+        stats = {}
+        result = build_scan_result(iter_new_history(state, history_path, family, stats=stats, immutable=immutable),
+                                   browser=browser)
+        result["incremental"] = {"new_urls": stats.get("rows", 0), "checked": stats.get("checked", 0),
+                                 "reused": stats.get("reused", 0)}
+        return result
+    finally:
+        state.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental browser history scans with persisted watermarks.")
+    parser.add_argument("--state", default=STATE_FILE, help="State store path")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scan = commands.add_parser("scan", help="Scan visits since the last run")
+    scan.add_argument("history", nargs="?", help="History or places.sqlite path (defaults to Brave's Default profile)")
+    scan.add_argument("--family", choices=sorted(NEW_VISITS_QUERIES), default="chromium")
+    scan.add_argument("--immutable", action="store_true",
+                      help="Open the database as immutable; only for copies no browser is writing")
+
+    compact = commands.add_parser("compact", help="Drop old seen-URL entries")
+    compact.add_argument("--max-age-days", type=float, default=SEEN_MAX_AGE_DAYS)
+
+    commands.add_parser("stats", help="Show state store size")
+    args = parser.parse_args()
+
+    if args.command == "scan":
+        browser = "Firefox" if args.family == "firefox" else "Brave"
+        result = scan_incremental(args.history, args.family, browser, args.state, args.immutable)
+        print(json.dumps(result, indent=4))
+        if "error" in result:
+            sys.exit(1)
+    elif args.command == "compact":
+        state = ScanState(args.state)
+        print(f"Removed {state.compact(args.max_age_days)} seen URLs")
+        state.close()
+    else:
+        state = ScanState(args.state)
+        print(json.dumps(state.stats(), indent=4))
+        state.close()
+
+
+if __name__ == "__main__":
+    main()
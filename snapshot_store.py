@@ -0,0 +1,323 @@
+"""
+Append-only history of system info, forensic and browser scan results.
+
+Each result is flattened into (path, value) fields. Values are stored once in
+a content-addressed table keyed by their hash, so a snapshot that repeats
+earlier values only adds one row per field pointing at the existing value.
+A result identical to the previous snapshot of the same host and kind is not
+stored again, and prune keeps only the newest snapshots of each host and kind.
+Diffing two snapshots compares the value ids of each path through the
+(snapshot, path) primary key, so its cost depends on the size of the two
+snapshots and not on how many are stored.
+
+    python snapshot_store.py list --kind sysinfo
+    python snapshot_store.py diff 12 15
+    python snapshot_store.py prune --keep 50
+"""
+
+import os
+import json
+import time
+import socket
+import sqlite3
+import hashlib
+import argparse
+
+SNAPSHOT_DB = "snapshots.db"
+
+# Snapshots record_snapshot keeps per host and kind; 0 keeps all of them
+SNAPSHOT_KEEP = int(os.environ.get("SNAPSHOT_KEEP", "0"))
+
+SNAPSHOT_KINDS = ("sysinfo", "forensics", "browser")
+
+# Per-run bookkeeping that would make every snapshot differ
+IGNORED_FIELDS = {
+    "sysinfo": ("Collection Time (s)", "Cache"),
+}
+
+
+def canonical_json(value):
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def flatten(result, prefix=()):
+    """Yield (path, value) for every leaf; lists, scalars and empty dicts are leaves."""
+    for key, value in result.items():
+        path = prefix + (str(key),)
+        if isinstance(value, dict) and value:
+            yield from flatten(value, path)
+        else:
+            yield path, value
+
+
+def unflatten(fields):
+    result = {}
+    for path, value in fields:
+        node = result
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = value
+    return result
+
+
+class SnapshotStore:
+    """Snapshots per host and kind, with field values deduplicated across all snapshots."""
+
+    def __init__(self, path=SNAPSHOT_DB):
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            "id INTEGER PRIMARY KEY, host TEXT NOT NULL, kind TEXT NOT NULL, created_at REAL NOT NULL, "
+            "field_count INTEGER NOT NULL, fields_hash BLOB)"
+        )
+        # Stores from before results were deduplicated; their snapshots have no hash and never match
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(snapshots)")}
+        if "fields_hash" not in columns:
+            self.conn.execute("ALTER TABLE snapshots ADD COLUMN fields_hash BLOB")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS snapshots_host ON snapshots (host, kind, created_at)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS field_values ("
+            "id INTEGER PRIMARY KEY, hash BLOB NOT NULL UNIQUE, value TEXT NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS snapshot_fields ("
+            "snapshot_id INTEGER NOT NULL, path TEXT NOT NULL, value_id INTEGER NOT NULL, position INTEGER NOT NULL, "
+            "PRIMARY KEY (snapshot_id, path)) WITHOUT ROWID"
+        )
+        # Lets prune find values no snapshot refers to any more
+        self.conn.execute("CREATE INDEX IF NOT EXISTS snapshot_fields_value ON snapshot_fields (value_id)")
+        self.conn.commit()
+
+    def _value_ids(self, values):
+        """Map each serialized value to its id, inserting only values not stored before."""
+        by_hash = {hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest(): value for value in values}
+        ids = {}
+        hashes = list(by_hash)
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            ids.update(self.conn.execute(
+                f"SELECT hash, id FROM field_values WHERE hash IN ({placeholders})", chunk
+            ).fetchall())
+        for key in hashes:
+            if key not in ids:
+                ids[key] = self.conn.execute("INSERT INTO field_values (hash, value) VALUES (?, ?)",
+                                             (key, by_hash[key])).lastrowid
+        return {value: ids[key] for key, value in by_hash.items()}
+
+    def record(self, kind, result, host=None, created_at=None):
+        """Append one result as a new snapshot and return its id.
+
+        If the result has the same fields as the previous snapshot of this host
+        and kind, nothing is stored and that snapshot's id is returned.
+        """
+        if kind not in SNAPSHOT_KINDS:
+            raise ValueError(f"Unknown snapshot kind: {kind}")
+        host = host or socket.gethostname()
+        ignored = IGNORED_FIELDS.get(kind, ())
+        fields = [(json.dumps(path), canonical_json(value)) for path, value in flatten(result)
+                  if path[0] not in ignored]
+        digest = hashlib.blake2b(digest_size=16)
+        for path, value in fields:
+            digest.update(f"{path}\0{value}\n".encode("utf-8"))
+        fields_hash = digest.digest()
+
+        with self.conn:
+            previous = self.conn.execute(
+                "SELECT id, fields_hash FROM snapshots WHERE host = ? AND kind = ? "
+                "ORDER BY created_at DESC, id DESC LIMIT 1", (host, kind)
+            ).fetchone()
+            if previous and previous[1] == fields_hash:
+                return previous[0]
+            value_ids = self._value_ids({value for _, value in fields})
+            snapshot_id = self.conn.execute(
+                "INSERT INTO snapshots (host, kind, created_at, field_count, fields_hash) VALUES (?, ?, ?, ?, ?)",
+                (host, kind, created_at or time.time(), len(fields), fields_hash)
+            ).lastrowid
+            self.conn.executemany(
+                "INSERT INTO snapshot_fields (snapshot_id, path, value_id, position) VALUES (?, ?, ?, ?)",
+                ((snapshot_id, path, value_ids[value], position) for position, (path, value) in enumerate(fields))
+            )
+        return snapshot_id
+
+    @staticmethod
+    def _where(host=None, kind=None):
+        clauses, params = [], []
+        if host:
+            clauses.append("host = ?")
+            params.append(host)
+        if kind:
+            clauses.append("kind = ?")
+            params.append(kind)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def snapshots(self, host=None, kind=None, limit=100):
+        """Newest snapshots first, optionally for one host and/or kind."""
+        where, params = self._where(host, kind)
+        query = f"SELECT id, host, kind, created_at, field_count FROM snapshots{where}"
+        query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        rows = self.conn.execute(query, (*params, limit)).fetchall()
+        return [{"id": row[0], "host": row[1], "kind": row[2], "created_at": row[3], "field_count": row[4]}
+                for row in rows]
+
+    def load(self, snapshot_id):
+        """Rebuild the stored result, or None if the snapshot does not exist."""
+        if not self.conn.execute("SELECT 1 FROM snapshots WHERE id = ?", (snapshot_id,)).fetchone():
+            return None
+        rows = self.conn.execute(
+            "SELECT f.path, v.value FROM snapshot_fields f JOIN field_values v ON v.id = f.value_id "
+            "WHERE f.snapshot_id = ? ORDER BY f.position", (snapshot_id,)
+        )
+        return unflatten((tuple(json.loads(path)), json.loads(value)) for path, value in rows)
+
+    def prune(self, keep, host=None, kind=None):
+        """Delete all but the newest keep snapshots of each host and kind; returns how many were deleted.
+
+        Stored values that no remaining snapshot refers to are deleted with them.
+        """
+        if keep < 1:
+            raise ValueError("keep must be at least 1")
+        where, params = self._where(host, kind)
+        with self.conn:
+            snapshot_ids = [row[0] for row in self.conn.execute(
+                "SELECT id FROM (SELECT id, ROW_NUMBER() OVER "
+                f"(PARTITION BY host, kind ORDER BY created_at DESC, id DESC) AS age FROM snapshots{where}) "
+                "WHERE age > ?", (*params, keep))]
+            value_ids = set()
+            for i in range(0, len(snapshot_ids), 500):
+                chunk = snapshot_ids[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                value_ids.update(row[0] for row in self.conn.execute(
+                    f"SELECT DISTINCT value_id FROM snapshot_fields WHERE snapshot_id IN ({placeholders})", chunk))
+                self.conn.execute(f"DELETE FROM snapshot_fields WHERE snapshot_id IN ({placeholders})", chunk)
+                self.conn.execute(f"DELETE FROM snapshots WHERE id IN ({placeholders})", chunk)
+            value_ids = list(value_ids)
+            for i in range(0, len(value_ids), 500):
+                chunk = value_ids[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                self.conn.execute(
+                    f"DELETE FROM field_values WHERE id IN ({placeholders}) "
+                    "AND NOT EXISTS (SELECT 1 FROM snapshot_fields WHERE value_id = field_values.id)", chunk)
+        return len(snapshot_ids)
+
+    def diff(self, old_id, new_id):
+        """Return the fields added, removed or changed between two snapshots of the same host and kind."""
+        found = {row[0]: (row[1], row[2]) for row in self.conn.execute(
+            "SELECT id, host, kind FROM snapshots WHERE id IN (?, ?)", (old_id, new_id))}
+        for snapshot_id in (old_id, new_id):
+            if snapshot_id not in found:
+                raise ValueError(f"No snapshot {snapshot_id}")
+        if found[old_id] != found[new_id]:
+            raise ValueError(f"Snapshot {old_id} is {found[old_id][1]} on {found[old_id][0]} but snapshot {new_id} "
+                             f"is {found[new_id][1]} on {found[new_id][0]}; only snapshots of one host and kind "
+                             "can be compared")
+        rows = self.conn.execute(
+            "SELECT n.path, o.value_id, n.value_id FROM snapshot_fields n "
+            "LEFT JOIN snapshot_fields o ON o.snapshot_id = ? AND o.path = n.path "
+            "WHERE n.snapshot_id = ? AND (o.value_id IS NULL OR o.value_id != n.value_id) "
+            "UNION ALL "
+            "SELECT o.path, o.value_id, NULL FROM snapshot_fields o "
+            "LEFT JOIN snapshot_fields n ON n.snapshot_id = ? AND n.path = o.path "
+            "WHERE o.snapshot_id = ? AND n.path IS NULL",
+            (old_id, new_id, new_id, old_id)
+        ).fetchall()
+        changed = {path: (old_value_id, new_value_id) for path, old_value_id, new_value_id in rows}
+
+        value_ids = list({value_id for pair in changed.values() for value_id in pair if value_id is not None})
+        values = {}
+        for i in range(0, len(value_ids), 500):
+            chunk = value_ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            values.update((value_id, json.loads(value)) for value_id, value in self.conn.execute(
+                f"SELECT id, value FROM field_values WHERE id IN ({placeholders})", chunk))
+
+        changes = []
+        for path in sorted(changed):
+            old_value_id, new_value_id = changed[path]
+            if old_value_id is None:
+                change = {"path": json.loads(path), "change": "added", "new": values[new_value_id]}
+            elif new_value_id is None:
+                change = {"path": json.loads(path), "change": "removed", "old": values[old_value_id]}
+            else:
+                change = {"path": json.loads(path), "change": "changed",
+                          "old": values[old_value_id], "new": values[new_value_id]}
+            changes.append(change)
+        return changes
+
+    def stats(self):
+        snapshots = self.conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+        fields = self.conn.execute("SELECT COUNT(*) FROM snapshot_fields").fetchone()[0]
+        values = self.conn.execute("SELECT COUNT(*) FROM field_values").fetchone()[0]
+        return {"snapshots": snapshots, "fields": fields, "distinct_values": values}
+
+    def close(self):
+        self.conn.close()
+
+
+def record_snapshot(kind, result, host=None, path=SNAPSHOT_DB, keep=SNAPSHOT_KEEP):
+    """Append a result to the store; a store failure never fails the scan that produced it.
+
+    With keep set, older snapshots of this host and kind beyond the newest keep are pruned.
+    """
+    try:
+        store = SnapshotStore(path)
+        try:
+            snapshot_id = store.record(kind, result, host)
+            if keep:
+                store.prune(keep, host or socket.gethostname(), kind)
+            return snapshot_id
+        finally:
+            store.close()
+    except sqlite3.Error as e:
+        print(f"Could not record {kind} snapshot: {e}")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=SNAPSHOT_DB, help="Snapshot store path")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    listing = commands.add_parser("list", help="List snapshots, newest first")
+    listing.add_argument("--host")
+    listing.add_argument("--kind", choices=SNAPSHOT_KINDS)
+    listing.add_argument("--limit", type=int, default=20)
+
+    show = commands.add_parser("show", help="Print one stored result")
+    show.add_argument("snapshot_id", type=int)
+
+    diff = commands.add_parser("diff", help="Compare two snapshots")
+    diff.add_argument("old_id", type=int)
+    diff.add_argument("new_id", type=int)
+
+    prune = commands.add_parser("prune", help="Delete all but the newest snapshots of each host and kind")
+    prune.add_argument("--keep", type=int, required=True, help="Snapshots to keep per host and kind")
+    prune.add_argument("--host")
+    prune.add_argument("--kind", choices=SNAPSHOT_KINDS)
+
+    commands.add_parser("stats", help="Show store size")
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.db)
+    try:
+        if args.command == "list":
+            output = store.snapshots(args.host, args.kind, args.limit)
+        elif args.command == "show":
+            output = store.load(args.snapshot_id)
+        elif args.command == "diff":
+            output = store.diff(args.old_id, args.new_id)
+        elif args.command == "prune":
+            output = {"deleted": store.prune(args.keep, args.host, args.kind), **store.stats()}
+        else:
+            output = store.stats()
+        print(json.dumps(output, indent=4, default=str))
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,100 +1,446 @@
-import subprocess
+import os
+import sys
 import json
+import time
+import platform
+import threading
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from snapshot_store import record_snapshot
+from metrics import span, CACHE_REQUESTS
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import winreg
+except ImportError:
+    winreg = None
+
+# "native" reads what it can in-process and shells out only for the rest, "powershell" runs every command
+SYSINFO_BACKENDS = ("native", "powershell")
+SYSINFO_BACKEND = os.environ.get("SYSINFO_BACKEND", "native" if psutil else "powershell")
+
+# PowerShell commands to fetch system information
+COMMANDS = {
+    "Installed OS and Version": "Get-ItemProperty -Path 'HKLM:\\SOFTWARE\\Microsoft\\Windows NT\\CurrentVersion' | Select-Object -Property ProductName, CurrentVersion, BuildLabEx | ConvertTo-Json -Depth 1",
+    "Boot Time": "(gcim Win32_OperatingSystem).LastBootUpTime | ConvertTo-Json",
+    "Current Time": "Get-Date | ConvertTo-Json",
+    "BIOS/UEFI Information": "Get-ItemProperty -Path 'HKLM:\\HARDWARE\\DESCRIPTION\\System\\BIOS' | Select-Object -Property BIOSVendor, BIOSVersion, BIOSReleaseDate | ConvertTo-Json",
+    "System Model and Manufacturer": "Get-ItemProperty -Path 'HKLM:\\HARDWARE\\DESCRIPTION\\System\\BIOS' | Select-Object -Property SystemManufacturer, SystemProductName | ConvertTo-Json",
+    "Installed RAM (GB)": "(Get-CimInstance -ClassName Win32_ComputerSystem).TotalPhysicalMemory / 1GB",
+    "Processor Details": "Get-ItemProperty -Path 'HKLM:\\HARDWARE\\DESCRIPTION\\System\\CentralProcessor\\0' | Select-Object -Property ProcessorNameString, Identifier | ConvertTo-Json",
+    "HDD/SSD Details": "Get-PhysicalDisk | Select-Object -Property DeviceID, Model, MediaType, Size | ConvertTo-Json -Depth 1",
+    "Graphics Card Details": "Get-CimInstance -ClassName Win32_VideoController | Select-Object -Property Name, DriverVersion, VideoProcessor, AdapterRAM | ConvertTo-Json -Depth 1",
+    "Motherboard Model": "Get-ItemProperty -Path 'HKLM:\\HARDWARE\\DESCRIPTION\\System\\BIOS' | Select-Object -Property BaseBoardManufacturer, BaseBoardProduct | ConvertTo-Json",
+    "System Serial Number": "Get-CimInstance -ClassName Win32_BIOS | Select-Object -Property SerialNumber | ConvertTo-Json",
+    "Users": "Get-LocalUser | Select-Object Name | ConvertTo-Json"
+}
+
+# Seconds before a single command is abandoned, and how many run at once
+COMMAND_TIMEOUT = float(os.environ.get("SYSINFO_COMMAND_TIMEOUT", "15"))
+COMMAND_WORKERS = int(os.environ.get("SYSINFO_COMMAND_WORKERS", "6"))
+
+def run_powershell(command, timeout):
+    """Default command runner: one PowerShell process, killed if it exceeds the timeout."""
+    result = subprocess.run(
+        ["powershell", "-Command", command],
+        capture_output=True, text=True, check=True, timeout=timeout
+    )
+    return result.stdout
 
-def execute_command(command):
+def execute_command(command, timeout=COMMAND_TIMEOUT, runner=None):
     """Executes a PowerShell command and returns the result."""
+    runner = runner or run_powershell
     try:
-        result = subprocess.run(
-            ["powershell", "-Command", command],
-            capture_output=True, text=True, check=True
-        )
-        return result.stdout.strip() if result.stdout else "No Data"
-    except subprocess.CalledProcessError as e:
+        output = runner(command, timeout)
+        return output.strip() if output else "No Data"
+    except subprocess.TimeoutExpired:
+        return f"Error: timed out after {timeout}s"
+    except Exception as e:
+        # Any failing runner (including a custom one) only costs its own field
         return f"Error: {e}"
 
+def run_commands(commands, runner=None, timeout=COMMAND_TIMEOUT, max_workers=COMMAND_WORKERS):
+    """Runs {key: command} concurrently; returns {key: (output, seconds)}.
+
+    Each command gets its own timeout, counted from when it starts. A runner that
+    ignores the timeout is abandoned once it overruns, and commands still queued
+    when the overall deadline passes are reported as timed out, so one hanging
+    query never stalls the whole collection.
+    """
+    if not commands:
+        return {}
+
+    started = {}
+
+    def run(key, command):
+        started[key] = time.perf_counter()
+        output = execute_command(command, timeout, runner)
+        return output, time.perf_counter() - started[key]
+
+    workers = max(1, min(max_workers, len(commands)))
+    rounds = -(-len(commands) // workers)
+    deadline = time.perf_counter() + timeout * rounds + 1.0
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sysinfo")
+    pending = {executor.submit(run, key, command): key for key, command in commands.items()}
+    results = {}
+    try:
+        while pending:
+            done, _ = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = future.result()
+
+            now = time.perf_counter()
+            for future, key in list(pending.items()):
+                overran = key in started and now - started[key] > timeout
+                if overran or now > deadline:
+                    del pending[future]
+                    future.cancel()
+                    results[key] = (f"Error: timed out after {timeout}s", now - started.get(key, now))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return {key: (output, round(seconds, 4)) for key, (output, seconds) in results.items()}
+
 def convert_to_gb(size_in_bytes):
     """Converts size from bytes to GB."""
     return round(size_in_bytes / (1024 ** 3), 2) if size_in_bytes else 0
 
-def gather_system_info():
-    """Gathers system information and returns it in a structured format."""
-    system_info = {}
-    
-    # PowerShell commands to fetch system information
-    commands = {
-        "Installed OS and Version": "Get-ItemProperty -Path 'HKLM:\\SOFTWARE\\Microsoft\\Windows NT\\CurrentVersion' | Select-Object -Property ProductName, CurrentVersion, BuildLabEx | ConvertTo-Json -Depth 1",
-        "Boot Time": "(gcim Win32_OperatingSystem).LastBootUpTime | ConvertTo-Json",
-        "Current Time": "Get-Date | ConvertTo-Json",
-        "BIOS/UEFI Information": "Get-ItemProperty -Path 'HKLM:\\HARDWARE\\DESCRIPTION\\System\\BIOS' | Select-Object -Property BIOSVendor, BIOSVersion, BIOSReleaseDate | ConvertTo-Json",
-        "System Model and Manufacturer": "Get-ItemProperty -Path 'HKLM:\\HARDWARE\\DESCRIPTION\\System\\BIOS' | Select-Object -Property SystemManufacturer, SystemProductName | ConvertTo-Json",
-        "Installed RAM (GB)": "(Get-CimInstance -ClassName Win32_ComputerSystem).TotalPhysicalMemory / 1GB",
-        "Processor Details": "Get-ItemProperty -Path 'HKLM:\\HARDWARE\\DESCRIPTION\\System\\CentralProcessor\\0' | Select-Object -Property ProcessorNameString, Identifier | ConvertTo-Json",
-        "HDD/SSD Details": "Get-PhysicalDisk | Select-Object -Property DeviceID, Model, MediaType, Size | ConvertTo-Json -Depth 1",
-        "Graphics Card Details": "Get-CimInstance -ClassName Win32_VideoController | Select-Object -Property Name, DriverVersion, VideoProcessor, AdapterRAM | ConvertTo-Json -Depth 1",
-        "Motherboard Model": "Get-ItemProperty -Path 'HKLM:\\HARDWARE\\DESCRIPTION\\System\\BIOS' | Select-Object -Property BaseBoardManufacturer, BaseBoardProduct | ConvertTo-Json",
-        "System Serial Number": "Get-CimInstance -ClassName Win32_BIOS | Select-Object -Property SerialNumber | ConvertTo-Json",
-        "Users": "Get-LocalUser | Select-Object Name | ConvertTo-Json"
-    }
-
-    for key, command in commands.items():
-        output = execute_command(command)
+def parse_command_output(key, output):
+    """Turns the output of one PowerShell command into its system info value."""
+    try:
+        if key == "Installed RAM (GB)":
+            return round(float(output), 2)
+        elif key == "HDD/SSD Details":
+            parsed_output = json.loads(output)
+            # Ensure this is a list of dictionaries and extract the details
+            return [{
+                "Device ID": h.get("DeviceID"),
+                "Model": h.get("Model"),
+                "Media Type": h.get("MediaType"),
+                "Size (GB)": convert_to_gb(h.get("Size", 0))
+            } for h in (parsed_output if isinstance(parsed_output, list) else [parsed_output])]
+        elif key == "Graphics Card Details":
+            parsed_output = json.loads(output)
+            return [{
+                "Name": card["Name"],
+                "Driver Version": card["DriverVersion"],
+                "Video Processor": card["VideoProcessor"],
+                "Adapter RAM (GB)": convert_to_gb(card["AdapterRAM"])
+            } for card in (parsed_output if isinstance(parsed_output, list) else [parsed_output])]
+        elif key == "Users":
+            parsed_output = json.loads(output)
+            # Prepare formatted user list with total count
+            user_list = {f"user {i+1:02}": user["Name"] for i, user in enumerate(parsed_output)}
+            return {
+                "total users": len(parsed_output),
+                **user_list
+            }
+        else:
+            return json.loads(output)
+    except (json.JSONDecodeError, SyntaxError, ValueError):
+        return output
+
+# Native collectors: each returns the same shape as the PowerShell path, or None when it has no native source
+
+def format_datetime(dt):
+    """Formats like PowerShell's DateTime property, e.g. "Monday, June 3, 2024 9:05:01 PM"."""
+    hour = dt.hour % 12 or 12
+    return f"{dt:%A}, {dt:%B} {dt.day}, {dt.year} {hour}:{dt:%M:%S} {dt:%p}"
+
+def read_registry_values(path, names):
+    if winreg is None:
+        return None
+    try:
+        with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, path) as key:
+            values = {}
+            for name in names:
+                try:
+                    values[name] = winreg.QueryValueEx(key, name)[0]
+                except OSError:
+                    values[name] = None
+            return values
+    except OSError:
+        return None
+
+def read_dmi(fields):
+    """Reads Linux DMI attributes, mapped to the Windows value names."""
+    values = {}
+    for name, dmi_name in fields.items():
         try:
-            if key == "Installed RAM (GB)":
-                system_info[key] = round(float(output), 2)
-            elif key == "HDD/SSD Details":
-                parsed_output = json.loads(output)
-                # Ensure this is a list of dictionaries and extract the details
-                system_info[key] = [{
-                    "Device ID": h.get("DeviceID"),
-                    "Model": h.get("Model"),
-                    "Media Type": h.get("MediaType"),
-                    "Size (GB)": convert_to_gb(h.get("Size", 0))
-                } for h in (parsed_output if isinstance(parsed_output, list) else [parsed_output])]
-            elif key == "Graphics Card Details":
-                parsed_output = json.loads(output)
-                system_info[key] = [{
-                    "Name": card["Name"],
-                    "Driver Version": card["DriverVersion"],
-                    "Video Processor": card["VideoProcessor"],
-                    "Adapter RAM (GB)": convert_to_gb(card["AdapterRAM"])
-                } for card in (parsed_output if isinstance(parsed_output, list) else [parsed_output])]
-            elif key == "Users":
-                parsed_output = json.loads(output)
-                # Prepare formatted user list with total count
-                user_list = {f"user {i+1:02}": user["Name"] for i, user in enumerate(parsed_output)}
-                system_info[key] = {
-                    "total users": len(parsed_output),
-                    **user_list
-                }
-            else:
-                system_info[key] = json.loads(output)
-        except (json.JSONDecodeError, SyntaxError):
-            system_info[key] = output
-
-    # Remove unnecessary fields
-    fields_to_remove = {
-        "Boot Time": ["value"],
-        "Current Time": ["value", "DisplayHint"]
-    }
-
-    def remove_fields(data, fields):
-        """Removes specified fields from the data."""
-        for field, keys in fields.items():
-            if field in data:
-                if keys:
+            with open(f"/sys/class/dmi/id/{dmi_name}", "r") as f:
+                values[name] = f.read().strip()
+        except OSError:
+            values[name] = None
+    return values if any(values.values()) else None
+
+def read_cpuinfo():
+    info = {}
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            for line in f:
+                if not line.strip():
+                    break
+                name, _, value = line.partition(":")
+                info[name.strip()] = value.strip()
+    except OSError:
+        pass
+    return info
+
+def native_os_version():
+    if sys.platform == "win32":
+        return read_registry_values(r"SOFTWARE\Microsoft\Windows NT\CurrentVersion",
+                                    ("ProductName", "CurrentVersion", "BuildLabEx"))
+    product_name = f"{platform.system()} {platform.release()}"
+    if hasattr(platform, "freedesktop_os_release"):
+        try:
+            product_name = platform.freedesktop_os_release().get("PRETTY_NAME", product_name)
+        except OSError:
+            pass
+    return {"ProductName": product_name, "CurrentVersion": platform.release(), "BuildLabEx": platform.version()}
+
+def native_boot_time():
+    return {"DateTime": format_datetime(datetime.fromtimestamp(psutil.boot_time()))}
+
+def native_current_time():
+    return {"DateTime": format_datetime(datetime.now())}
+
+def native_bios():
+    if sys.platform == "win32":
+        return read_registry_values(r"HARDWARE\DESCRIPTION\System\BIOS",
+                                    ("BIOSVendor", "BIOSVersion", "BIOSReleaseDate"))
+    return read_dmi({"BIOSVendor": "bios_vendor", "BIOSVersion": "bios_version", "BIOSReleaseDate": "bios_date"})
+
+def native_system_model():
+    if sys.platform == "win32":
+        return read_registry_values(r"HARDWARE\DESCRIPTION\System\BIOS",
+                                    ("SystemManufacturer", "SystemProductName"))
+    return read_dmi({"SystemManufacturer": "sys_vendor", "SystemProductName": "product_name"})
+
+def native_ram():
+    return round(psutil.virtual_memory().total / (1024 ** 3), 2)
+
+def native_processor():
+    if sys.platform == "win32":
+        return read_registry_values(r"HARDWARE\DESCRIPTION\System\CentralProcessor\0",
+                                    ("ProcessorNameString", "Identifier"))
+    cpu = read_cpuinfo()
+    identifier = (f"{platform.machine()} Family {cpu.get('cpu family', '?')} Model {cpu.get('model', '?')} "
+                  f"Stepping {cpu.get('stepping', '?')}, {cpu.get('vendor_id', '?')}")
+    return {"ProcessorNameString": cpu.get("model name") or platform.processor(), "Identifier": identifier}
+
+def native_disks():
+    # Physical disk models need WMI on Windows; Linux exposes them in sysfs
+    if not os.path.isdir("/sys/block"):
+        return None
+    disks = []
+    for name in sorted(os.listdir("/sys/block")):
+        if name.startswith(("loop", "ram", "zram", "dm-", "md")):
+            continue
+        base = os.path.join("/sys/block", name)
+        try:
+            with open(os.path.join(base, "size"), "r") as f:
+                size = int(f.read().strip()) * 512
+            with open(os.path.join(base, "queue", "rotational"), "r") as f:
+                media_type = "HDD" if f.read().strip() == "1" else "SSD"
+        except (OSError, ValueError):
+            continue
+        try:
+            with open(os.path.join(base, "device", "model"), "r") as f:
+                model = f.read().strip()
+        except OSError:
+            model = None
+        disks.append({"Device ID": name, "Model": model, "Media Type": media_type, "Size (GB)": convert_to_gb(size)})
+    return disks or None
+
+def native_motherboard():
+    if sys.platform == "win32":
+        return read_registry_values(r"HARDWARE\DESCRIPTION\System\BIOS",
+                                    ("BaseBoardManufacturer", "BaseBoardProduct"))
+    return read_dmi({"BaseBoardManufacturer": "board_vendor", "BaseBoardProduct": "board_name"})
+
+def native_serial_number():
+    # Win32_BIOS has no registry equivalent, so Windows keeps the CIM query
+    if sys.platform == "win32":
+        return None
+    return read_dmi({"SerialNumber": "product_serial"})
+
+def native_users():
+    # psutil.users() only lists logged-in sessions, not local accounts; Windows keeps Get-LocalUser
+    if sys.platform == "win32":
+        return None
+    import pwd
+    names = sorted(user.pw_name for user in pwd.getpwall()
+                   if user.pw_uid == 0 or (user.pw_uid >= 1000 and not user.pw_shell.endswith(("nologin", "false"))))
+    user_list = {f"user {i+1:02}": name for i, name in enumerate(names)}
+    return {"total users": len(names), **user_list}
+
+NATIVE_COLLECTORS = {
+    "Installed OS and Version": native_os_version,
+    "Boot Time": native_boot_time,
+    "Current Time": native_current_time,
+    "BIOS/UEFI Information": native_bios,
+    "System Model and Manufacturer": native_system_model,
+    "Installed RAM (GB)": native_ram,
+    "Processor Details": native_processor,
+    "HDD/SSD Details": native_disks,
+    "Motherboard Model": native_motherboard,
+    "System Serial Number": native_serial_number,
+    "Users": native_users,
+}
+
+def collect_native(key):
+    # Collectors that need psutil fail without it and fall back to the command
+    collector = NATIVE_COLLECTORS.get(key)
+    if collector is None:
+        return None
+    try:
+        return collector()
+    except Exception:
+        return None
+
+# Remove unnecessary fields
+FIELDS_TO_REMOVE = {
+    "Boot Time": ["value"],
+    "Current Time": ["value", "DisplayHint"]
+}
+
+def remove_fields(data, fields):
+    """Removes specified fields from the data."""
+    for field, keys in fields.items():
+        if field in data:
+            if keys:
+                if isinstance(data[field], dict):
                     for key in keys:
                         data[field].pop(key, None)
+            else:
+                data.pop(field, None)
+
+def collect_fields(keys, backend=None, runner=None, timeout=COMMAND_TIMEOUT, max_workers=COMMAND_WORKERS):
+    """Collects the given fields; returns ({key: value}, {key: seconds})."""
+    backend = backend or SYSINFO_BACKEND
+    system_info = {}
+    timings = {}
+    shell_commands = {}
+
+    with span("sysinfo_native"):
+        for key in keys:
+            command = COMMANDS[key]
+            start = time.perf_counter()
+            value = collect_native(key) if backend == "native" else None
+            if value is None:
+                # No native source for this field (or the PowerShell backend was chosen)
+                if backend == "native" and sys.platform != "win32" and runner is None:
+                    value = "Not available"
                 else:
-                    data.pop(field, None)
+                    shell_commands[key] = command
+            system_info[key] = value
+            timings[key] = round(time.perf_counter() - start, 4)
+
+    # Whatever still needs a shell runs concurrently, each command with its own timeout
+    if shell_commands:
+        with span("sysinfo_commands"):
+            results = run_commands(shell_commands, runner, timeout, max_workers)
+        for key, (output, seconds) in results.items():
+            system_info[key] = parse_command_output(key, output)
+            timings[key] = seconds
 
-    remove_fields(system_info, fields_to_remove)
+    remove_fields(system_info, FIELDS_TO_REMOVE)
+    return system_info, timings
+
+def gather_system_info(backend=None, runner=None, timeout=COMMAND_TIMEOUT, max_workers=COMMAND_WORKERS):
+    """Gathers system information and returns it in a structured format."""
+    system_info, timings = collect_fields(COMMANDS, backend, runner, timeout, max_workers)
+    system_info["Collection Time (s)"] = timings
 
     # Write the system information to a JSON file
-    with open("SysInfo.json", "w") as json_file:
+    with span("json_write"), open("SysInfo.json", "w") as json_file:
         json.dump(system_info, json_file, indent=4)
 
     return system_info
 
+# Seconds each class of field stays cached; volatile fields are read on every request
+FIELD_TTLS = {
+    "static": int(os.environ.get("SYSINFO_STATIC_TTL", str(6 * 3600))),
+    "semi-static": int(os.environ.get("SYSINFO_SEMI_STATIC_TTL", "300")),
+    "volatile": 0,
+}
+
+# Boot time only changes with a reboot, which also restarts the server
+FIELD_CLASSES = {
+    "Installed OS and Version": "semi-static",
+    "Boot Time": "static",
+    "Current Time": "volatile",
+    "BIOS/UEFI Information": "static",
+    "System Model and Manufacturer": "static",
+    "Installed RAM (GB)": "static",
+    "Processor Details": "static",
+    "HDD/SSD Details": "semi-static",
+    "Graphics Card Details": "static",
+    "Motherboard Model": "static",
+    "System Serial Number": "static",
+    "Users": "semi-static",
+}
+
+class SystemInfoCache:
+    """In-memory system info where each field is collected again only once its TTL expires.
+
+    Volatile fields always come from the in-process collectors, so serving a
+    warm cache never starts a subprocess. Failed commands are retried after the
+    semi-static TTL rather than being pinned for hours.
+    """
+
+    def __init__(self, backend=None, runner=None, ttls=None, clock=time.monotonic):
+        self.backend = backend
+        self.runner = runner
+        self.ttls = ttls or FIELD_TTLS
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.values = {}
+        self.expires = {}
+
+    def ttl(self, key, value):
+        ttl = self.ttls[FIELD_CLASSES.get(key, "volatile")]
+        if isinstance(value, str) and value.startswith("Error"):
+            ttl = min(ttl, self.ttls["semi-static"])
+        return ttl
+
+    def get(self, force=False):
+        """Returns the system info, collecting expired fields (or everything if force)."""
+        with self.lock:
+            now = self.clock()
+            stale = [key for key in COMMANDS if force or now >= self.expires.get(key, 0)]
+            volatile = [key for key in stale if FIELD_CLASSES.get(key) == "volatile"]
+            rest = [key for key in stale if key not in volatile]
+
+            timings = dict.fromkeys(COMMANDS, 0.0)
+            for keys, backend in ((volatile, "native"), (rest, self.backend)):
+                if not keys:
+                    continue
+                values, seconds = collect_fields(keys, backend, self.runner)
+                timings.update(seconds)
+                for key, value in values.items():
+                    self.values[key] = value
+                    self.expires[key] = now + self.ttl(key, value)
+
+            system_info = {key: self.values[key] for key in COMMANDS}
+            system_info["Collection Time (s)"] = timings
+            system_info["Cache"] = {"collected": len(stale), "cached": len(COMMANDS) - len(stale)}
+            CACHE_REQUESTS.inc(len(COMMANDS) - len(stale), cache="sysinfo", result="hit")
+            CACHE_REQUESTS.inc(len(stale), cache="sysinfo", result="miss")
+            return system_info
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+            self.expires.clear()
+
 if __name__ == "__main__":
     info = gather_system_info()
+    record_snapshot("sysinfo", info)
     print(json.dumps(info, indent=4))